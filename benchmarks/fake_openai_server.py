@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Servidor HTTP que imita /v1/chat/completions de OpenAI con una latencia fija.
+# La app lo usa a través del SDK real (OPENAI_BASE_URL), así que se mide también el cliente HTTP.
+
+DEFAULT_CONTENT = '{"mensaje": "Ánimo, todo mejora con el tiempo.", "refran": "No hay mal que dure cien años.", "cancion": "Color esperanza"}'
+
+app = FastAPI()
+app.state.latency = 0.5
+app.state.content = DEFAULT_CONTENT
+app.state.chunks = 8
+
+
+def completion_id():
+    return f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+
+def usage(body, content):
+    prompt_tokens = sum(len(message.get("content", "").split()) for message in body.get("messages", []))
+    completion_tokens = len(content.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4")
+    content = app.state.content
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(body, model, content), media_type="text/event-stream")
+
+    await asyncio.sleep(app.state.latency)
+    return JSONResponse({
+        "id": completion_id(),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage(body, content),
+    })
+
+
+async def stream_completion(body, model, content):
+    # La latencia se reparte entre los fragmentos: el primero llega antes que la respuesta completa
+    chunk_id = completion_id()
+    chunk_size = max(len(content) // app.state.chunks, 1)
+    pieces = [content[start:start + chunk_size] for start in range(0, len(content), chunk_size)]
+    for piece in pieces:
+        await asyncio.sleep(app.state.latency / len(pieces))
+        chunk = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    final = {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+    yield f"data: {json.dumps(final)}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        usage_chunk = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model, "choices": [], "usage": usage(body, content)}
+        yield f"data: {json.dumps(usage_chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de OpenAI para benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Segundos por respuesta")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+import aiohttp
+import psutil
+
+# Benchmark de carga de la API. Arranca el servidor falso de OpenAI y la app (benchmarks.serve),
+# lanza peticiones concurrentes contra cada endpoint y guarda latencias, throughput, RSS y CPU en JSON.
+#
+#   python -m benchmarks.tiny_model
+#   python -m benchmarks.run --concurrency 16 --requests 400 --save benchmarks/baselines/local.json
+#   python -m benchmarks.run --compare benchmarks/baselines/local.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXTS = [
+    "hola",
+    "estoy triste",
+    "Hoy me siento muy bien, gracias por preguntar.",
+    "Estoy cansado del trabajo y no tengo ganas de nada.",
+    "Mañana es el cumpleaños de mi mamá y estoy contento.",
+    "No sé qué hacer con mi vida, todo me sale mal.",
+]
+PREFERENCES = ["libro", "video de youtube", "cancion", "serie", "chiste", "refran"]
+
+
+def build_payload(endpoint, unique):
+    text = random.choice(TEXTS)
+    # Con unique se añade un sufijo para que la caché de sentimiento no responda por el modelo
+    if unique:
+        text = f"{text} {random.randrange(10 ** 9)}"
+    if endpoint == "/sentiment":
+        return {"text": text, "log_id": 1}
+    if endpoint == "/personalized_response":
+        return {"text": text}
+    if endpoint == "/sugerencia":
+        return {"message": text, "preference": random.choice(PREFERENCES)}
+    return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+# Muestrea RSS y CPU del proceso del servidor mientras dura cada escenario
+class ProcessSampler:
+    def __init__(self, pid, interval=0.2):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.rss = []
+        self.cpu = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.process.cpu_percent(None)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        self.rss.append(self.process.memory_info().rss)
+        self.cpu.append(self.process.cpu_percent(None))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # Garantiza al menos una muestra en escenarios más cortos que el intervalo
+        self._sample()
+
+    def summary(self):
+        return {
+            "rss_peak_mb": max(self.rss, default=0) / (1024 * 1024),
+            "rss_avg_mb": sum(self.rss) / len(self.rss) / (1024 * 1024) if self.rss else 0.0,
+            "cpu_avg_percent": sum(self.cpu) / len(self.cpu) if self.cpu else 0.0,
+            "cpu_peak_percent": max(self.cpu, default=0.0),
+        }
+
+
+async def run_scenario(session, base_url, endpoint, total, concurrency, unique):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            payload = build_payload(endpoint, unique)
+            start_time = time.perf_counter()
+            try:
+                if payload is None:
+                    request = session.get(base_url + endpoint)
+                else:
+                    request = session.post(base_url + endpoint, json=payload)
+                async with request as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    return {
+        "requests": total,
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+async def run_benchmark(base_url, server_pid, endpoints, total, concurrency, unique, warmup):
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=120)
+    results = {}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        for endpoint in endpoints:
+            if warmup:
+                await run_scenario(session, base_url, endpoint, warmup, min(concurrency, warmup), unique)
+            with ProcessSampler(server_pid) as sampler:
+                result = await run_scenario(session, base_url, endpoint, total, concurrency, unique)
+            result.update(sampler.summary())
+            results[endpoint] = result
+            print(
+                f"{endpoint:<24} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms  "
+                f"p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                f"RSS {result['rss_peak_mb']:7.1f} MB  CPU {result['cpu_avg_percent']:5.1f}%  errores {result['errors']}"
+            )
+    return results
+
+
+def wait_until_ready(url, process, timeout):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El proceso terminó antes de estar listo: {' '.join(process.args)}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout}s")
+
+
+def start_servers(args):
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_KEY": "bench",
+        "OPENAI_FAKE": "false",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+        "TELEGRAM_TOKEN": "bench",
+        "API_URL": f"http://127.0.0.1:{args.port}/",
+        "DB_HOST": "127.0.0.1",
+        "DB_PORT": "3306",
+        "DB_USER": "bench",
+        "DB_PASS": "bench",
+        "DB_NAME": "bench",
+        "SENTIMENT_MODEL_ID": args.model,
+        "BENCH_DB_LATENCY": str(args.db_latency),
+        # Todo el tráfico sale de un único cliente: con el límite por cliente se mediría el 429
+        "RATE_LIMIT_RATE": "0",
+    })
+    fake_openai = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai_server", "--port", str(args.openai_port), "--latency", str(args.openai_latency)],
+        cwd=ROOT, env=env
+    )
+    app_server = subprocess.Popen([sys.executable, "-m", "benchmarks.serve", "--port", str(args.port)], cwd=ROOT, env=env)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.openai_port}/docs", fake_openai, 30)
+        wait_until_ready(f"http://127.0.0.1:{args.port}/ready", app_server, args.startup_timeout)
+    except Exception:
+        stop_servers(fake_openai, app_server)
+        raise
+    return fake_openai, app_server
+
+
+def stop_servers(*processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def compare(results, baseline, tolerance):
+    # Una regresión es p95 más alto o throughput más bajo que la línea base más allá de la tolerancia
+    regressions = []
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(endpoint)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {previous['p95_ms']:.1f} ms -> {current['p95_ms']:.1f} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{endpoint}: errores {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    from benchmarks.tiny_model import DEFAULT_PATH
+
+    parser = argparse.ArgumentParser(description="Benchmark de latencia y carga de la API con sustitutos locales.")
+    parser.add_argument("--endpoints", nargs="+", default=["/status", "/sentiment", "/personalized_response", "/sugerencia"])
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Peticiones de calentamiento por endpoint, no cuentan")
+    parser.add_argument("--unique-texts", action="store_true", help="Textos distintos en cada petición para saltarse la caché de sentimiento")
+    parser.add_argument("--model", default=DEFAULT_PATH, help="Modelo de sentimiento; por defecto el diminuto de benchmarks.tiny_model")
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--openai-port", type=int, default=9100)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--url", help="Medir una API ya en marcha en lugar de arrancarla; requiere --pid")
+    parser.add_argument("--pid", type=int, help="PID del servidor en marcha para medir RSS y CPU")
+    parser.add_argument("--save", help="Guarda los resultados en este archivo JSON")
+    parser.add_argument("--compare", help="Línea base JSON con la que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Margen relativo antes de considerar una regresión")
+    args = parser.parse_args()
+    if args.url and args.pid is None:
+        parser.error("--url requiere --pid")
+
+    if args.url is None and args.model == DEFAULT_PATH and not os.path.exists(DEFAULT_PATH):
+        from benchmarks.tiny_model import build_tiny_model
+        build_tiny_model(DEFAULT_PATH)
+
+    processes = ()
+    if args.url:
+        base_url, server_pid = args.url.rstrip("/"), args.pid
+    else:
+        processes = start_servers(args)
+        base_url, server_pid = f"http://127.0.0.1:{args.port}", processes[1].pid
+
+    try:
+        endpoints = asyncio.run(run_benchmark(
+            base_url, server_pid, args.endpoints, args.requests, args.concurrency, args.unique_texts, args.warmup
+        ))
+    finally:
+        stop_servers(*processes)
+
+    results = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "unique_texts": args.unique_texts,
+            "model": args.model,
+            "openai_latency": args.openai_latency,
+            "db_latency": args.db_latency,
+            "cpu_count": os.cpu_count(),
+        },
+        "endpoints": endpoints,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f"Resultados guardados en {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regresiones respecto a {args.compare} (revisión {baseline.get('revision')}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"Sin regresiones respecto a {args.compare} (tolerancia {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import argparse
+import os
+import uvicorn
+
+
+# Arranca la app con MySQL sustituido por MemoryDatabaseManager. La configuración (modelo,
+# OPENAI_BASE_URL, tamaños de batch...) llega por variables de entorno como en producción.
+def main():
+    parser = argparse.ArgumentParser(description="Sirve src.app con sustitutos locales para los benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--db-latency", type=float, default=float(os.environ.get("BENCH_DB_LATENCY", "0")))
+    args = parser.parse_args()
+
+    import src.db.db_manage
+    from benchmarks.stand_ins import MemoryDatabaseManager
+
+    # Se parchea antes de importar la app, que crea su DatabaseManager al importarse
+    src.db.db_manage.DatabaseManager = lambda *a, **kw: MemoryDatabaseManager(*a, db_latency=args.db_latency, **kw)
+
+    from src.app import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import itertools
+import threading
+import time
+
+
+# Sustituto en memoria de DatabaseManager para los benchmarks: mismos métodos que usa la app,
+# sin MySQL. db_latency simula el tiempo de ida y vuelta de cada consulta.
+class MemoryDatabaseManager:
+    def __init__(self, db_host=None, db_port=None, db_user=None, db_pass=None, db_name=None, db_latency=0.0, **kwargs):
+        self.db_latency = db_latency
+        self.tables = {"user_log": [], "sentiment": [], "analysis": [], "personalized_response": []}
+        self.status = None
+        self._log_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def _round_trip(self):
+        with self._lock:
+            self.queries += 1
+        if self.db_latency:
+            time.sleep(self.db_latency)
+
+    def connect(self):
+        self._round_trip()
+
+    def get_pool_stats(self):
+        # Mismas claves que ConnectionPool.get_stats para que /db/pool y /metrics funcionen igual
+        return {
+            "checkouts": self.queries, "in_use": 0, "timeouts": 0, "reconnects": 0, "errors": 0,
+            "wait_time_total": 0.0, "wait_time_max": 0.0, "size": 0, "open": 0, "idle": 0,
+            "utilization": 0.0, "wait_time_avg": 0.0,
+        }
+
+    def close_connection(self):
+        pass
+
+    def execute_query(self, query, data):
+        self._round_trip()
+
+    def insert_user_log(self, data):
+        self._round_trip()
+        log_id = next(self._log_ids)
+        self.tables["user_log"].append((log_id, *data))
+        return log_id
+
+    def insert_status(self, data):
+        self._round_trip()
+        self.status = {"id": 1, **data}
+
+    def get_status(self):
+        self._round_trip()
+        return self.status
+
+    def get_user_ids(self):
+        self._round_trip()
+        return list({row[1] for row in self.tables["user_log"]})
+
+    def user_exists(self, user_id):
+        self._round_trip()
+        return any(row[1] == user_id for row in self.tables["user_log"])
+
+    def insert_sentiment(self, *row):
+        self._round_trip()
+        self.tables["sentiment"].append(row)
+
+    def insert_analysis(self, *row):
+        self._round_trip()
+        self.tables["analysis"].append(row)
+
+    def insert_personalized_response(self, *row):
+        self._round_trip()
+        self.tables["personalized_response"].append(row)
+
+    def insert_sentiments(self, rows):
+        self._round_trip()
+        self.tables["sentiment"].extend(rows)
+        return len(rows)
+
+    def insert_analyses(self, rows):
+        self._round_trip()
+        self.tables["analysis"].extend(rows)
+        return len(rows)
+
+    def insert_personalized_responses(self, rows):
+        self._round_trip()
+        self.tables["personalized_response"].extend(rows)
+        return len(rows)
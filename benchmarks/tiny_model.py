@@ -0,0 +1,69 @@
+import argparse
+import os
+
+# Genera un modelo BERT diminuto con pesos aleatorios y las mismas etiquetas que el modelo real (1-5).
+# Las predicciones no significan nada, pero el pipeline de transformers hace el mismo trabajo
+# (tokenizar, forward, softmax) y no hace falta descargar nada de internet.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "tiny-sentiment")
+
+VOCABULARY = (
+    "hola hoy estoy me siento muy bien mal feliz triste cansado enojado contento día noche "
+    "trabajo familia amigos gracias por favor no sí qué cómo cuando todo nada algo mucho poco "
+    "el la los las un una de del en con sin para es son fue era tengo tienes quiero necesito "
+    "película canción libro serie chiste refrán ayer mañana siempre nunca también pero porque"
+).split()
+
+
+def build_tiny_model(path=DEFAULT_PATH, seed=0):
+    import torch
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertForSequenceClassification, PreTrainedTokenizerFast
+
+    os.makedirs(path, exist_ok=True)
+    characters = sorted({character for word in VOCABULARY for character in word} | set("abcdefghijklmnopqrstuvwxyz0123456789.,;:!?¿¡"))
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *VOCABULARY, *characters, *(f"##{c}" for c in characters)]
+    vocab = {token: index for index, token in enumerate(dict.fromkeys(tokens))}
+
+    # Tokenizer WordPiece construido con tokenizers para no depender de la API de cada versión de transformers
+    backend = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]"))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True, strip_accents=False)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])]
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]",
+        model_max_length=512
+    )
+
+    labels = ["1", "2", "3", "4", "5"]
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=512,
+        num_labels=len(labels),
+        id2label=dict(enumerate(labels)),
+        label2id={label: index for index, label in enumerate(labels)}
+    )
+    torch.manual_seed(seed)
+    BertForSequenceClassification(config).eval().save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera el modelo de sentimiento diminuto para los benchmarks.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    args = parser.parse_args()
+    print(f"Modelo diminuto guardado en {build_tiny_model(args.path)}")
+
+
+if __name__ == "__main__":
+    main()
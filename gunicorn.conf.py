@@ -0,0 +1,60 @@
+import gc
+import os
+import tempfile
+from src.config import get_settings
+from src.worker_metrics import WorkerMetrics
+
+# Configuración de gunicorn para servir la API con varios procesos:
+#   gunicorn -c gunicorn.conf.py src.app:app
+# Con PRELOAD_MODELS=true los modelos se cargan una vez en el maestro y los workers los
+# comparten copy-on-write tras el fork, en lugar de tener cada uno su propia copia.
+
+_SETTINGS = get_settings()
+_CPUS = os.cpu_count() or 1
+
+# Cada worker vuelca sus métricas en este directorio para que /metrics devuelva las de todos.
+# La app se importa en este mismo proceso (preload), así que comparte los ajustes ya cargados.
+if not _SETTINGS.metrics_dir:
+    _SETTINGS.metrics_dir = tempfile.mkdtemp(prefix="assistbot-metrics-")
+_WORKER_METRICS = WorkerMetrics(_SETTINGS.metrics_dir)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = _SETTINGS.web_workers or _CPUS
+worker_class = "uvicorn.workers.UvicornWorker"
+# La app se importa en el maestro antes de crear los workers
+preload_app = True
+# La carga de los modelos en cada worker (calentamiento incluido) puede tardar
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Hilos de PyTorch/BLAS por worker: entre todos no deberían superar los núcleos disponibles
+threads_per_worker = _SETTINGS.web_threads_per_worker or max(_CPUS // workers, 1)
+raw_env = [f"{name}={threads_per_worker}" for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")]
+
+
+def on_starting(server):
+    # Los volcados de una ejecución anterior no corresponden a ningún worker vivo
+    os.makedirs(_SETTINGS.metrics_dir, exist_ok=True)
+    for file_name in os.listdir(_SETTINGS.metrics_dir):
+        os.remove(os.path.join(_SETTINGS.metrics_dir, file_name))
+
+
+def when_ready(server):
+    # Los objetos creados hasta aquí (modelos incluidos) pasan a la generación permanente: el GC de
+    # los workers no los recorre ni escribe en ellos, y sus páginas siguen compartidas
+    gc.freeze()
+    server.log.info(f"Maestro listo con {workers} workers y {threads_per_worker} hilos de inferencia por worker")
+
+
+def post_fork(server, worker):
+    import sys
+
+    # Por si PyTorch ya fijó su número de hilos en el maestro
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads_per_worker)
+
+
+def child_exit(server, worker):
+    # Las métricas de un worker que ya no existe dejan de publicarse
+    _WORKER_METRICS.remove(worker.pid)
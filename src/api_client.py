@@ -0,0 +1,149 @@
+import json
+import time
+from src.metrics import Histogram
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, path, retry_after=None):
+        super().__init__(f"La API respondió {status_code} en {path}")
+        self.status_code = status_code
+        self.path = path
+        self.retry_after = retry_after
+
+
+class _LatencyMetrics:
+    def __init__(self):
+        self._latency = {}
+
+    def _observe(self, endpoint, elapsed):
+        histogram = self._latency.get(endpoint)
+        if histogram is None:
+            histogram = self._latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS))
+        histogram.observe(elapsed)
+
+    def get_stats(self):
+        return {endpoint: histogram.snapshot() for endpoint, histogram in self._latency.items()}
+
+
+# Cliente síncrono hacia la API para el bot con hilos: una sesión de requests compartida
+# con pool de conexiones keep-alive, timeouts explícitos y reintentos solo en GET
+class ApiClient(_LatencyMetrics):
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=60.0, retries=3, backoff_factor=0.5):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        super().__init__()
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        # Los POST no se reintentan: /sentiment y compañía escriben en la base de datos
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def get(self, path):
+        return self._request("GET", path)
+
+    def post(self, path, payload, stream=False, headers=None):
+        return self._request("POST", path, json=payload, stream=stream, headers=headers)
+
+    # Misma interfaz que AsyncApiClient: las respuestas que no son 200 se convierten en ApiError
+    def get_json(self, path):
+        return self._json(path, self.get(path))
+
+    def post_json(self, path, payload, headers=None):
+        return self._json(path, self.post(path, payload, headers=headers))
+
+    def stream_events(self, path, payload, headers=None):
+        with self.post(path, payload, stream=True, headers=headers) as response:
+            if response.status_code != 200:
+                raise ApiError(response.status_code, path, response.headers.get("Retry-After"))
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+    def _json(self, path, response):
+        if response.status_code != 200:
+            raise ApiError(response.status_code, path, response.headers.get("Retry-After"))
+        return response.json()
+
+    def _request(self, method, path, **kwargs):
+        # Con stream=True se mide el tiempo hasta recibir las cabeceras
+        start_time = time.perf_counter()
+        try:
+            return self._session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        finally:
+            self._observe(f"{method} /{path}", time.perf_counter() - start_time)
+
+    def close(self):
+        self._session.close()
+
+
+# Cliente asíncrono hacia la API con una única sesión aiohttp: las conexiones TCP se
+# reutilizan (keep-alive) entre todos los chats del bot
+class AsyncApiClient(_LatencyMetrics):
+    def __init__(self, base_url, pool_size=20, timeout=60.0, connect_timeout=5.0):
+        super().__init__()
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._session = None
+
+    async def start(self):
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_json(self, path):
+        start_time = time.perf_counter()
+        try:
+            async with self._session.get(self.base_url + path) as response:
+                if response.status != 200:
+                    raise ApiError(response.status, path, response.headers.get("Retry-After"))
+                return await response.json()
+        finally:
+            self._observe(f"GET /{path}", time.perf_counter() - start_time)
+
+    async def post_json(self, path, payload, headers=None):
+        start_time = time.perf_counter()
+        try:
+            async with self._session.post(self.base_url + path, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    raise ApiError(response.status, path, response.headers.get("Retry-After"))
+                return await response.json()
+        finally:
+            self._observe(f"POST /{path}", time.perf_counter() - start_time)
+
+    async def stream_events(self, path, payload, headers=None):
+        # Lee una respuesta NDJSON línea a línea según va llegando; se mide hasta las cabeceras
+        start_time = time.perf_counter()
+        async with self._session.post(self.base_url + path, json=payload, headers=headers) as response:
+            self._observe(f"POST /{path}", time.perf_counter() - start_time)
+            if response.status != 200:
+                raise ApiError(response.status, path, response.headers.get("Retry-After"))
+            async for line in response.content:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
@@ -1,51 +1,216 @@
+import hmac
+import logging
+import math
 import os
 import time
 import requests
-import openai
-import spacy
 import json
-import psutil
-from fastapi import FastAPI, UploadFile, File, HTTPException, status,Depends, Request
-from fastapi.responses import JSONResponse, Response, FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, status,Depends, Request, Query
+from fastapi.responses import JSONResponse, Response, FileResponse, StreamingResponse
 from functools import cache
-from datetime import datetime
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from mysql.connector import Error
+from pydantic import ValidationError
 from src.db.db_manage import DatabaseManager
-from src.sentiment import SentimentAnalysisService
+from src.db.write_behind import WriteBehindWriter, insert_rows
+from src.sentiment import get_sentiment_service
+from src.batching import SentimentBatcher
+from src.resources import ResourceSampler, worker_memory_report
+from src.lifecycle import ComponentRegistry, ComponentUnavailable
+from src.status_cache import StatusCache, etag_matches
+from src.suggestion_cache import SuggestionCache
+from src.llm_gateway import create_llm_gateway, build_personalized_messages, build_suggestion_messages
+from src.rate_limit import create_rate_limiter, check_client_secret
+from src.coalescing import SingleFlight
+from src.sentiment_cache import normalize_text
+from src.db.db_manage import REPORT_DATASETS
+from src import reports
 from src.config import get_settings
-from typing import List
+from src.logs import configure_logging
+from src.metrics import REGISTRY, observe_stage
+from src.observability import MetricsMiddleware
+from src.worker_metrics import WorkerMetrics
+from typing import List, Optional
 from src.response_models import (
+    MAX_BATCH_ITEMS,
     CombinedReportResponse,
     SentimentAnalysisResponse,
     TextAnalysisResponse,
     StatusResponse,
     SentimentRequest,
+    SentimentBatchItem,
+    SentimentBatchRequest,
+    SentimentBatchResponse,
     AnalysisRequest,
+    AnalysisBatchRequest,
+    AnalysisBatchResponse,
     PersonalizedResponse,
     PersonalizedRequest,
     SuggestionRequest,
-    SuggestionResponse
+    SuggestionResponse,
+    LabelDistributionResponse,
+    LatencyReportResponse,
+    UserTrendResponse,
+    ReportPageResponse
 )
 
 
 _SETTINGS = get_settings()
 
+configure_logging(_SETTINGS.log_level, _SETTINGS.log_format)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    check_client_secret(_SETTINGS)
+    components.start()
+    status_cache.start()
+    sentiment_batcher.start()
+    resource_sampler.start()
+    telemetry_writer.start()
+    worker_metrics.start()
+    yield
+    await worker_metrics.stop()
+    await components.stop()
+    await status_cache.stop()
+    await sentiment_batcher.stop()
+    await suggestion_cache.close()
+    resource_sampler.stop()
+    # Vacía la cola de telemetría antes de cerrar las conexiones
+    await run_in_threadpool(telemetry_writer.close)
+    db_manager.close_connection()
+
 app = FastAPI(
     title=_SETTINGS.service_name,
-    version=_SETTINGS.k_revision
+    version=_SETTINGS.k_revision,
+    lifespan=lifespan
 )
 
-db_manager = DatabaseManager(_SETTINGS.db_host, _SETTINGS.db_port, _SETTINGS.db_user, _SETTINGS.db_pass, _SETTINGS.db_name)
+app.add_middleware(MetricsMiddleware)
+
+# La conexión se abre durante el arranque, no al importar el módulo
+db_manager = DatabaseManager(
+    _SETTINGS.db_host, _SETTINGS.db_port, _SETTINGS.db_user, _SETTINGS.db_pass, _SETTINGS.db_name,
+    pool_size=_SETTINGS.db_pool_size,
+    pool_timeout=_SETTINGS.db_pool_timeout,
+    ping_interval=_SETTINGS.db_ping_interval,
+    connect=False
+)
 
-nlp = spacy.load("es_core_news_sm")
+telemetry_writer = WriteBehindWriter(
+    db_manager,
+    max_queue_size=_SETTINGS.telemetry_queue_size,
+    batch_size=_SETTINGS.telemetry_batch_size,
+    flush_interval=_SETTINGS.telemetry_flush_interval
+)
 
-client = openai.OpenAI(api_key=_SETTINGS.openai_key)
+def load_sentiment_model():
+    # Con --preload se carga en el maestro y los workers heredan el componente ya listo
+    return get_sentiment_service()
 
-def get_sentiment_service():
-    return SentimentAnalysisService()
+def warm_up_sentiment_model():
+    # La primera inferencia se hace en cada worker: en el maestro arrancaría los hilos de PyTorch antes del fork
+    components.get("sentiment_model").warmup()
 
-@app.get("/status", response_model=StatusResponse, summary="Obtiene estado del servicio", description="Obtiene el estado actual del servicio, incluyendo información sobre los modelos utilizados.")
-def get_status():
+def load_llm_client():
+    from src.llm import create_llm_client
+    return create_llm_client(_SETTINGS)
+
+@cache
+def load_nlp():
+    import spacy
+    # Los componentes que no aportan POS ni NER no se cargan
+    return spacy.load(_SETTINGS.nlp_model, exclude=_SETTINGS.nlp_exclude)
+
+components = ComponentRegistry(_SETTINGS.component_retry_interval, _SETTINGS.component_retry_max_interval)
+components.register("sentiment_model", load_sentiment_model)
+components.register("sentiment_warmup", warm_up_sentiment_model)
+components.register("database", db_manager.connect)
+components.register("openai", load_llm_client)
+# spaCy solo lo usa /analysis: por defecto se carga con la primera petición
+components.register("nlp", load_nlp, eager=_SETTINGS.nlp_preload)
+
+def preload_models():
+    # Con gunicorn --preload esto corre en el maestro antes del fork: los pesos quedan en páginas
+    # compartidas copy-on-write por todos los workers. La inferencia de calentamiento no se hace aquí
+    # sino en cada worker (componente sentiment_warmup), para no arrancar los hilos de PyTorch antes del fork.
+    components.get("sentiment_model")
+    if _SETTINGS.nlp_preload:
+        components.get("nlp")
+
+if _SETTINGS.preload_models:
+    try:
+        preload_models()
+    except Exception as e:
+        # El componente queda como fallido y cada worker lo vuelve a intentar al arrancar
+        logger.error("Error al precargar los modelos: %s", e)
+
+# El cliente de OpenAI se resuelve en cada llamada para respetar su carga diferida
+llm_gateway = create_llm_gateway(_SETTINGS, lambda: components.aget("openai"))
+
+rate_limiter = create_rate_limiter(_SETTINGS)
+# Mensajes idénticos en curso a la vez comparten una sola respuesta personalizada de OpenAI
+personalized_flights = SingleFlight("personalized_response")
+
+def is_trusted_client(request: Request):
+    # Solo quien conoce el secreto compartido (el bot) puede elegir su identificador de cliente
+    secret = _SETTINGS.rate_limit_client_secret
+    provided = request.headers.get(_SETTINGS.rate_limit_secret_header)
+    return bool(secret) and provided is not None and hmac.compare_digest(provided.encode(), secret.encode())
+
+
+def rate_limited(request: Request):
+    # El bot identifica a cada usuario de Telegram con la cabecera; el resto de clientes, por IP.
+    # Sin el secreto la cabecera se ignora: si no, cualquiera evitaría el límite cambiándola en cada petición
+    client_id = request.headers.get(_SETTINGS.rate_limit_client_header)
+    if not client_id or not is_trusted_client(request):
+        client_id = request.client.host if request.client else "unknown"
+    allowed, retry_after = rate_limiter.acquire(f"api:{client_id}")
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas peticiones, inténtalo de nuevo más tarde.",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+suggestion_cache = SuggestionCache(
+    max_entries=_SETTINGS.suggestion_cache_size,
+    ttl=_SETTINGS.suggestion_cache_ttl,
+    pool_size=_SETTINGS.suggestion_cache_pool_size
+)
+
+sentiment_batcher = SentimentBatcher(
+    lambda: components.get("sentiment_model"),
+    max_batch_size=_SETTINGS.sentiment_batch_max_size,
+    max_wait_ms=_SETTINGS.sentiment_batch_max_wait_ms
+)
+
+resource_sampler = ResourceSampler(
+    interval=_SETTINGS.resource_sample_interval,
+    window=_SETTINGS.resource_sample_window
+)
+
+@app.exception_handler(ComponentUnavailable)
+async def component_unavailable_handler(request: Request, exc: ComponentUnavailable):
+    # Un modelo que no carga (p. ej. falta el paquete de spaCy) es un fallo temporal del servicio, no un 500
+    logger.warning("Componente no disponible: %s", exc, extra={"component": exc.name, "path": request.url.path})
+    return JSONResponse(
+        {"detail": f"El componente {exc.name} no está disponible, inténtalo de nuevo más tarde."},
+        status_code=503,
+        headers={"Retry-After": str(math.ceil(components.retry_interval))}
+    )
+
+@app.get("/ready", summary="Disponibilidad del servicio", description="Indica si los componentes pesados ya están cargados y cuánto tardó cada uno en arrancar.")
+def get_readiness():
+    # Solo consulta el estado: los componentes fallidos se reintentan en segundo plano (ComponentRegistry._retry_loop)
+    report = components.get_report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+def build_status():
     status = db_manager.get_status()
     if not status:
         status_data = {
@@ -55,41 +220,62 @@ def get_status():
             "status": "Running",
             "models_info": json.dumps({
                 "sentiment_model": _SETTINGS.sentiment_model_id,
-                "nlp_model": "Spacy es_core_news_sm",
-                "gpt_model": _SETTINGS.model 
+                "nlp_model": f"Spacy {_SETTINGS.nlp_model}",
+                "gpt_model": _SETTINGS.model,
+                "gpt_fast_model": _SETTINGS.llm_fast_model
             })
         }
         db_manager.insert_status(status_data)
-        status = db_manager.get_status()
+        # Si la base de datos no responde se sirve el estado local igualmente
+        status = db_manager.get_status() or status_data
+
+    models_info = json.loads(status['models_info'])
+    sentiment_service = components.peek("sentiment_model")
+    if sentiment_service is not None:
+        models_info.update(sentiment_service.get_info())
 
     return {
         "service_name": status['service_name'],
         "version": status['version'],
         "log_level": status['log_level'],
         "status": status['status'],
-        "models_info": json.loads(status['models_info'])
+        "models_info": models_info
     }
 
+status_cache = StatusCache(build_status, refresh_interval=_SETTINGS.status_refresh_interval)
+# Cuando termina de cargarse un componente cambia models_info
+components.add_listener(lambda component: status_cache.invalidate())
+
+@app.get("/status", response_model=StatusResponse, summary="Obtiene estado del servicio", description="Obtiene el estado actual del servicio, incluyendo información sobre los modelos utilizados.")
+async def get_status(request: Request):
+    entry = status_cache.peek()
+    if entry is None:
+        entry = await run_in_threadpool(status_cache.get)
+    body, etag = entry
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.post("/sentiment", response_model=SentimentAnalysisResponse, summary="Analiza sentimiento", description="Realiza un análisis de sentimiento en el texto proporcionado.")
-def analyze_sentiment(request: SentimentRequest, sentiment_service: SentimentAnalysisService = Depends(SentimentAnalysisService)):
-    start_time = time.time()
-    result = sentiment_service.analyze_sentiment(request.text)
-    end_time = time.time()
-    execution_time = end_time - start_time
+async def analyze_sentiment(request: SentimentRequest):
+    start_time = time.perf_counter()
+    timings = {}
+    result = await sentiment_batcher.submit(request.text, timings)
+    execution_time = time.perf_counter() - start_time
 
     prediction_datetime = datetime.now().isoformat()
     text_length = len(request.text)
     model_version = _SETTINGS.sentiment_model_id
-    process = psutil.Process(os.getpid())
-    memory_info = process.memory_info().rss
-    cpu_usage = process.cpu_percent(interval=1)
+    memory_info, cpu_usage = resource_sampler.snapshot()
 
-    adjusted_score = (result[0]['score'] * 2) - 1
+    adjusted_score = (result['score'] * 2) - 1
 
     db_data = (
         request.log_id,
         request.text,
-        result[0]['label'],
+        result['label'],
         adjusted_score,
         prediction_datetime,
         execution_time,
@@ -99,15 +285,17 @@ def analyze_sentiment(request: SentimentRequest, sentiment_service: SentimentAna
         cpu_usage
     )
 
-    db_manager.insert_sentiment(*db_data)
+    telemetry_writer.insert_sentiment(*db_data)
 
     return {
         "prediction": {
-            "label": result[0]['label'],  # Asegúrate de que 'label' sea un string
+            "label": result['label'],  # Asegúrate de que 'label' sea un string
             "score": adjusted_score  # 'score' debe ser un float
         },
         "execution_info": {
             "execution_time": execution_time,  # float
+            "queue_time": timings.get("queue_time", 0.0),  # float
+            "model_time": timings.get("model_time", 0.0),  # float
             "prediction_datetime": prediction_datetime,  # string
             "text_length": text_length,  # int
             "model_version": model_version,  # string
@@ -116,20 +304,360 @@ def analyze_sentiment(request: SentimentRequest, sentiment_service: SentimentAna
         }
     }
 
-@app.post("/personalized_response", response_model=PersonalizedResponse)
+@app.post("/sentiment/batch", response_model=SentimentBatchResponse, summary="Analiza sentimiento en lote", description="Analiza una lista de textos en bloques del modelo y guarda todos los resultados con un único INSERT.")
+async def analyze_sentiment_batch(request: SentimentBatchRequest):
+    return await run_in_threadpool(score_sentiment_batch, request.items)
+
+@app.post("/sentiment/batch/ndjson", response_model=SentimentBatchResponse, summary="Analiza sentimiento desde un archivo NDJSON", description="Igual que /sentiment/batch, pero recibe un archivo con un objeto {text, log_id} por línea.")
+async def analyze_sentiment_batch_ndjson(file: UploadFile = File(...)):
+    content = await read_upload(file, _SETTINGS.sentiment_max_upload_bytes)
+    items = []
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(SentimentBatchItem.model_validate_json(line))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Línea {line_number} inválida: {e.errors()}")
+        if len(items) > MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=422, detail=f"El archivo no puede tener más de {MAX_BATCH_ITEMS} textos.")
+    return await run_in_threadpool(score_sentiment_batch, items)
+
+async def read_upload(file, max_bytes, chunk_size=65536):
+    # Se lee por trozos y se corta en cuanto se pasa del límite, sin cargar entero un archivo enorme
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"El archivo no puede superar {max_bytes} bytes.")
+    chunks = []
+    total = 0
+    while chunk := await file.read(chunk_size):
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"El archivo no puede superar {max_bytes} bytes.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def score_sentiment_batch(items):
+    sentiment_service = components.get("sentiment_model")
+    model_version = _SETTINGS.sentiment_model_id
+    chunk_size = _SETTINGS.sentiment_batch_chunk_size
+    memory_info, cpu_usage = resource_sampler.snapshot()
+
+    start_time = time.perf_counter()
+    results = []
+    db_rows = []
+    for chunk_start in range(0, len(items), chunk_size):
+        chunk = items[chunk_start:chunk_start + chunk_size]
+        chunk_start_time = time.perf_counter()
+        predictions = sentiment_service.analyze_batch([item.text for item in chunk])
+        # El tiempo del bloque se reparte entre sus textos
+        execution_time = (time.perf_counter() - chunk_start_time) / len(chunk)
+        prediction_datetime = datetime.now().isoformat()
+
+        for item, prediction in zip(chunk, predictions):
+            adjusted_score = (prediction['score'] * 2) - 1
+            text_length = len(item.text)
+            db_rows.append((
+                item.log_id,
+                item.text,
+                prediction['label'],
+                adjusted_score,
+                prediction_datetime,
+                execution_time,
+                model_version,
+                text_length,
+                memory_info,
+                cpu_usage
+            ))
+            results.append({
+                "prediction": {
+                    "label": prediction['label'],
+                    "score": adjusted_score
+                },
+                "execution_info": {
+                    "execution_time": execution_time,
+                    "prediction_datetime": prediction_datetime,
+                    "text_length": text_length,
+                    "model_version": model_version,
+                    "memory_usage": memory_info,
+                    "cpu_usage": cpu_usage
+                }
+            })
+    total_time = time.perf_counter() - start_time
+
+    # Una fila rechazada no debe perder el resto del lote; lo que no se guardó se indica en la respuesta
+    db_start_time = time.perf_counter()
+    stored = 0
+    if db_rows:
+        try:
+            stored = len(db_rows) - len(insert_rows(db_manager.insert_sentiments, db_rows))
+        except Error as e:
+            logger.error("Error al guardar el lote de análisis de sentimiento: %s", e, extra={"rows": len(db_rows)})
+    db_time = time.perf_counter() - db_start_time
+
+    return {
+        "results": results,
+        "execution_info": {
+            "total_time": total_time,
+            "db_time": db_time,
+            "items": len(items),
+            "stored": stored,
+            "chunks": -(-len(items) // chunk_size),
+            "chunk_size": chunk_size,
+            "items_per_second": len(items) / total_time if total_time else 0.0,
+            "model_version": model_version
+        }
+    }
+
+@app.post("/analysis", response_model=TextAnalysisResponse, summary="Analiza texto", description="Etiquetado gramatical (POS), entidades (NER) y sentimiento del texto proporcionado.")
+async def analyze_text(request: AnalysisRequest):
+    analysis = await run_in_threadpool(analyze_texts, [request])
+    result = analysis["results"][0]
+    result["execution_info"].update(analysis["execution_info"])
+    return result
+
+@app.post("/analysis/batch", response_model=AnalysisBatchResponse, summary="Analiza textos en lote", description="Igual que /analysis, pero procesa una lista de textos con nlp.pipe.")
+async def analyze_text_batch(request: AnalysisBatchRequest):
+    return await run_in_threadpool(analyze_texts, request.items)
+
+def analyze_texts(items):
+    sentiment_service = components.get("sentiment_model")
+    nlp = components.get("nlp")
+    texts = [item.text for item in items]
+    model_version = f"{_SETTINGS.sentiment_model_id}, {_SETTINGS.nlp_model}"
+    memory_info, cpu_usage = resource_sampler.snapshot()
+
+    start_time = time.perf_counter()
+    docs = list(nlp.pipe(texts, batch_size=_SETTINGS.nlp_batch_size, n_process=_SETTINGS.nlp_n_process))
+    nlp_time = time.perf_counter() - start_time
+    observe_stage("nlp", nlp_time)
+    sentiments = sentiment_service.analyze_batch(texts) if texts else []
+    total_time = time.perf_counter() - start_time
+    # El tiempo del lote se reparte entre sus textos
+    execution_time = total_time / len(texts) if texts else 0.0
+    prediction_datetime = datetime.now().isoformat()
+
+    results = []
+    for item, doc, sentiment in zip(items, docs, sentiments):
+        pos_tags = [f"{token.text}/{token.pos_}" for token in doc]
+        pos_counts = dict(Counter(token.pos_ for token in doc))
+        entities = [f"{ent.text} ({ent.label_})" for ent in doc.ents]
+        entity_counts = dict(Counter(ent.label_ for ent in doc.ents))
+        adjusted_score = (sentiment['score'] * 2) - 1
+        text_length = len(item.text)
+
+        telemetry_writer.insert_analysis(
+            item.log_id,
+            item.text,
+            " ".join(pos_tags),
+            json.dumps(pos_counts, ensure_ascii=False),
+            ", ".join(entities),
+            json.dumps(entity_counts, ensure_ascii=False),
+            sentiment['label'],
+            adjusted_score,
+            prediction_datetime,
+            execution_time,
+            model_version,
+            text_length,
+            memory_info,
+            cpu_usage
+        )
+
+        results.append({
+            "nlp_analysis": {
+                "pos_tags": pos_tags,
+                "pos_counts": pos_counts,
+                "entities": entities,
+                "entity_counts": entity_counts
+            },
+            "sentiment_analysis": {
+                "label": sentiment['label'],
+                "score": adjusted_score
+            },
+            "execution_info": {
+                "execution_time": execution_time,
+                "prediction_datetime": prediction_datetime,
+                "text_length": text_length,
+                "model_version": model_version,
+                "memory_usage": memory_info,
+                "cpu_usage": cpu_usage
+            }
+        })
+
+    return {
+        "results": results,
+        "execution_info": {
+            "total_time": total_time,
+            "nlp_time": nlp_time,
+            "items": len(items),
+            "docs_per_second": len(texts) / nlp_time if nlp_time else 0.0,
+            "batch_size": _SETTINGS.nlp_batch_size,
+            "n_process": _SETTINGS.nlp_n_process
+        }
+    }
+
+def collect_component_metrics():
+    # Estadísticas que ya calculan el pool, las cachés y las colas, leídas en cada /metrics
+    pool = db_manager.get_pool_stats()
+    telemetry = telemetry_writer.get_stats()
+    suggestions = suggestion_cache.get_stats()
+    cache_requests = [({"cache": "suggestion", "result": "hit"}, suggestions["hits"]), ({"cache": "suggestion", "result": "miss"}, suggestions["misses"])]
+    cache_entries = [({"cache": "suggestion"}, suggestions["entries"])]
+    sentiment_service = components.peek("sentiment_model")
+    if getattr(sentiment_service, "cache", None) is not None:
+        sentiment_cache = sentiment_service.cache.get_stats()
+        cache_requests += [({"cache": "sentiment", "result": result}, sentiment_cache[key]) for result, key in (("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))]
+        cache_entries.append(({"cache": "sentiment"}, sentiment_cache["entries"]))
+
+    return [
+        ("assistbot_db_pool_connections", "gauge", "Conexiones del pool de MySQL por estado",
+         [({"state": "open"}, pool["open"]), ({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])]),
+        ("assistbot_db_pool_checkouts_total", "counter", "Conexiones entregadas por el pool", [({}, pool["checkouts"])]),
+        ("assistbot_db_pool_wait_seconds_total", "counter", "Tiempo total esperando una conexión libre", [({}, pool["wait_time_total"])]),
+        ("assistbot_db_pool_timeouts_total", "counter", "Esperas de conexión que agotaron el timeout", [({}, pool["timeouts"])]),
+        ("assistbot_telemetry_rows_total", "counter", "Filas de telemetría por resultado",
+         [({"outcome": key}, telemetry[key]) for key in ("enqueued", "written", "dropped", "failed")]),
+        ("assistbot_telemetry_queue_depth", "gauge", "Filas de telemetría pendientes de escribir", [({}, telemetry["queued"])]),
+        ("assistbot_sentiment_queue_depth", "gauge", "Peticiones esperando al batcher de sentimiento", [({}, sentiment_batcher.get_stats()["queued"])]),
+        ("assistbot_cache_requests_total", "counter", "Consultas a las cachés por resultado", cache_requests),
+        ("assistbot_cache_entries", "gauge", "Entradas en cada caché", cache_entries),
+        ("assistbot_component_ready", "gauge", "1 si el componente pesado está cargado",
+         [({"component": name}, info["state"] == "ready") for name, info in components.get_report()["components"].items()]),
+    ]
+
+REGISTRY.register_collector(collect_component_metrics)
+
+# Con varios workers, /metrics y las estadísticas por worker combinan los de todos (ver src/worker_metrics.py)
+worker_metrics = WorkerMetrics(_SETTINGS.metrics_dir, _SETTINGS.metrics_flush_interval)
+worker_metrics.register_stats("batching", sentiment_batcher.get_stats)
+worker_metrics.register_stats("db_pool", db_manager.get_pool_stats)
+worker_metrics.register_stats("telemetry", telemetry_writer.get_stats)
+
+@app.get("/metrics", summary="Métricas en formato Prometheus", description="Histogramas por endpoint y por etapa, peticiones en curso, pool de MySQL, cachés, colas y tokens de OpenAI.")
+def get_metrics():
+    return Response(worker_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/sentiment/batching", summary="Estadísticas del batching", description="Histogramas de tamaño de batch y tiempo de espera en cola del modelo de sentimiento.")
+def get_batching_stats():
+    return worker_metrics.get_stats("batching")
+
+@app.get("/sentiment/cache", summary="Estadísticas de la caché de sentimiento", description="Aciertos en memoria y en disco, fallos y entradas de la caché de predicciones del modelo de sentimiento.")
+def get_sentiment_cache_stats():
+    sentiment_service = components.peek("sentiment_model")
+    if sentiment_service is None:
+        return {"enabled": _SETTINGS.sentiment_cache_size > 0, "loaded": False}
+    return sentiment_service.get_cache_stats()
+
+@app.get("/db/pool", summary="Estadísticas del pool de conexiones", description="Uso del pool de conexiones a MySQL: conexiones abiertas, en uso, esperas y reconexiones.")
+def get_db_pool_stats():
+    return worker_metrics.get_stats("db_pool")
+
+@app.get("/workers", summary="Memoria por worker", description="RSS, USS y PSS del maestro de gunicorn y de cada worker, para comprobar cuánta memoria de los modelos se comparte.")
+def get_worker_memory():
+    return worker_memory_report()
+
+REPORT_MAX_DAYS = 366
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def report_range(start, end, max_days=REPORT_MAX_DAYS):
+    # Por defecto los últimos 30 días; ambos extremos incluidos
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start debe ser anterior o igual a end.")
+    if max_days and (end - start).days + 1 > max_days:
+        raise HTTPException(status_code=422, detail=f"El rango no puede superar {max_days} días; use /report/export para rangos mayores.")
+    return start, end
+
+def report_query(query, *args):
+    try:
+        return query(*args)
+    except Error as e:
+        logger.error("Error al consultar los agregados del informe: %s", e)
+        raise HTTPException(status_code=503, detail="La base de datos no está disponible.")
+
+def data_until():
+    # Los agregados llegan hasta la última ejecución de la retención
+    watermark = report_query(db_manager.get_rollup_watermark, "sentiment_hourly")
+    return watermark.isoformat() if watermark else None
+
+@app.get("/report/labels", response_model=LabelDistributionResponse, summary="Distribución de etiquetas", description="Recuento diario de cada etiqueta de sentimiento y puntuación media, calculados desde sentiment_hourly.")
+def get_label_report(start: Optional[date] = None, end: Optional[date] = None):
+    start, end = report_range(start, end)
+    days, totals = reports.label_distribution(report_query(db_manager.get_label_distribution, *reports.day_range(start, end)))
+    return {"start": start.isoformat(), "end": end.isoformat(), "data_until": data_until(), "totals": totals, "days": days}
+
+@app.get("/report/latency", response_model=LatencyReportResponse, summary="Latencia por modelo", description="p50 y p95 diarios de tiempo_ejecucion por versión de modelo, estimados desde el histograma de sentiment_latency_hourly.")
+def get_latency_report(start: Optional[date] = None, end: Optional[date] = None):
+    start, end = report_range(start, end)
+    rows = reports.latency_report(report_query(db_manager.get_latency_buckets, *reports.day_range(start, end)))
+    return {"start": start.isoformat(), "end": end.isoformat(), "data_until": data_until(), "rows": rows}
+
+@app.get("/report/users/{user_id}", response_model=UserTrendResponse, summary="Tendencia de ánimo de un usuario", description="Etiquetas por día, puntuación media y etiqueta media de un usuario, desde sentiment_user_daily.")
+def get_user_report(user_id: int, start: Optional[date] = None, end: Optional[date] = None):
+    start, end = report_range(start, end)
+    range_start, range_end = reports.day_range(start, end)
+    days = reports.user_trend(report_query(db_manager.get_user_trend, user_id, range_start.date(), range_end.date()))
+    return {"user_id": user_id, "start": start.isoformat(), "end": end.isoformat(), "data_until": data_until(), "days": days}
+
+@app.get("/report/export/{dataset}", summary="Exporta los agregados", description="Filas de labels (sentiment_hourly), users (sentiment_user_daily) o latency (sentiment_latency_hourly). Con format=json devuelve páginas con next_cursor; con csv o ndjson envía todo el rango en streaming.")
+def export_report(
+    dataset: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    output_format: str = Query("csv", alias="format"),
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    if dataset not in REPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Conjunto desconocido: {dataset}. Opciones: {', '.join(REPORT_DATASETS)}")
+    start, end = report_range(start, end, max_days=None)
+    range_start, range_end = reports.day_range(start, end)
+    if dataset == "users":
+        range_start, range_end = range_start.date(), range_end.date()
+
+    if output_format == "json":
+        try:
+            return ReportPageResponse(**report_query(reports.report_page, db_manager, dataset, range_start, range_end, cursor, limit))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Cursor inválido.")
+    if output_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=422, detail="format debe ser json, csv o ndjson.")
+
+    stream = reports.stream_csv if output_format == "csv" else reports.stream_ndjson
+    file_name = f"{dataset}_{start.isoformat()}_{end.isoformat()}.{output_format}"
+    return StreamingResponse(
+        log_stream_errors(stream(db_manager, dataset, range_start, range_end, limit)),
+        media_type=EXPORT_MEDIA_TYPES[output_format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+def log_stream_errors(chunks):
+    # Una vez enviadas las cabeceras el error ya no se puede convertir en un 503: se corta la respuesta
+    try:
+        yield from chunks
+    except Error as e:
+        logger.error("Error durante la exportación del informe: %s", e)
+        raise
+
+@app.get("/db/telemetry", summary="Estadísticas de la cola de telemetría", description="Registros encolados, escritos, descartados y fallidos por el escritor en segundo plano.")
+def get_telemetry_stats():
+    return worker_metrics.get_stats("telemetry")
+
+@app.post("/personalized_response", response_model=PersonalizedResponse, dependencies=[Depends(rate_limited)])
 async def get_personalized_response(request: PersonalizedRequest):
-    sentiment_label = analyze_sentiment(request.text)
-    response_message = await generate_response_based_on_sentiment(sentiment_label, request.text)
+    sentiment_label = await analyze_sentiment(request.text)
+    response_message = await personalized_flights.do(
+        (sentiment_label, normalize_text(request.text)),
+        lambda: generate_response_based_on_sentiment(sentiment_label, request.text)
+    )
     return {"message": response_message}
 
 
-def analyze_sentiment(text):
-    sentiment_service = get_sentiment_service()
-    result = sentiment_service.analyze_sentiment(text)
-    return result[0]['label']
+async def analyze_sentiment(text):
+    result = await sentiment_batcher.submit(text)
+    return result['label']
 
-# Modifica la función generate_response_based_on_sentiment para aceptar el log_id
-async def generate_response_based_on_sentiment(sentiment_label, user_text):
+def build_mood_prompt(sentiment_label):
     if sentiment_label in ['4', '5']:
         mood = "feliz"
     elif sentiment_label == '3':
@@ -137,56 +665,63 @@ async def generate_response_based_on_sentiment(sentiment_label, user_text):
     else:
         mood = "triste o enojado"
 
-    prompt = f"Me siento {mood}. ¿Puedes proporcionar un mensaje de apoyo?"
+    return f"Me siento {mood}. ¿Puedes proporcionar un mensaje de apoyo?"
+
+# Modifica la función generate_response_based_on_sentiment para aceptar el log_id
+async def generate_response_based_on_sentiment(sentiment_label, user_text):
+    prompt = build_mood_prompt(sentiment_label)
 
     # Llama a la función para generar una respuesta basada en el sentimiento
-    response = generate_response_with_gpt4(prompt, user_text)  # Pasa el texto del usuario y log_id
+    response = await generate_response_with_gpt4(prompt, user_text)  # Pasa el texto del usuario y log_id
     return response
 
 # Modifica la función generate_response_with_gpt4 para aceptar el log_id
-def generate_response_with_gpt4(prompt, user_text):
-    response = client.chat.completions.create(
-        model=_SETTINGS.model,  # Utiliza GPT-4 para generar respuestas
-        messages=[
-            {"role": "system", "content": "Genera una respuesta basada en el sentimiento del usuario y responde siempre en español, ademas dale proverbios y refranes o algun chiste de acuerdo a su emocion, al final siempre recomiendale una cancion de acuerdo a su emocion, recuerda dar la respuesta en JSON"},
-            {"role": "user", "content": user_text},  # Agrega el texto del usuario como entrada
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,  # Temperatura moderada
-    )
+async def generate_response_with_gpt4(prompt, user_text):
+    # La ruta "personalized" usa el modelo principal con salida JSON
+    return await llm_gateway.complete("personalized", build_personalized_messages(prompt, user_text))
+
+@app.post("/personalized_response/stream", summary="Respuesta personalizada en streaming", description="Igual que /personalized_response, pero envía los tokens a medida que llegan como líneas JSON (NDJSON).", dependencies=[Depends(rate_limited)])
+async def stream_personalized_response(request: PersonalizedRequest):
+    sentiment_label = await analyze_sentiment(request.text)
+    prompt = build_mood_prompt(sentiment_label)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in llm_gateway.stream("personalized", build_personalized_messages(prompt, request.text)):
+                parts.append(delta)
+                yield json.dumps({"delta": delta}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Error durante el streaming de la respuesta personalizada: %s", e)
+            yield json.dumps({"error": "Error al generar la respuesta personalizada."}, ensure_ascii=False) + "\n"
+            return
+        yield json.dumps({"done": True, "message": llm_gateway.check_reply("personalized", "".join(parts))}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
 
-    return response.choices[0].message.content
+@app.get("/llm/routes", summary="Rutas de OpenAI", description="Modelo, límite de tokens y modo JSON de cada tipo de petición a OpenAI.")
+def get_llm_routes():
+    return llm_gateway.get_routes()
 
-@app.post("/sugerencia", response_model=SuggestionResponse)
+@app.get("/sugerencia/cache", summary="Estadísticas de la caché de sugerencias", description="Aciertos, fallos y entradas de la caché de respuestas de /sugerencia.")
+def get_suggestion_cache_stats():
+    return suggestion_cache.get_stats()
+
+@app.post("/sugerencia", response_model=SuggestionResponse, dependencies=[Depends(rate_limited)])
 async def get_suggestion(request: SuggestionRequest):
-    sentiment_service = SentimentAnalysisService()
-    sentiment_result = sentiment_service.analyze_sentiment(request.message)
-    sentiment_label = sentiment_result[0]['label']
-    
-    # Mapea la preferencia a un prompt específico para GPT-4
-    prompts = {
-        'libro': "Recomienda un libro para alguien que se siente {sentiment} y explica por qué lo recomiendas.",
-        'video de youtube': "Recomienda un video de YouTube para alguien que se siente {sentiment} y explica por qué lo recomiendas.",
-        'cancion': "Recomienda una canción para alguien que se siente {sentiment} y explica por qué la recomiendas",
-        'serie': "Recomienda una serie para alguien que se siente {sentiment} y explica por qué la recomiendas y en que plataforma se puede ver.",
-        'chiste': "Dime un chiste para alguien que se siente {sentiment}, trata de que tu chiste no sea muy basico o muy malo, usa tu poder para navegar en internet y encontrar un buen chiste.",
-        'refran': "Comparte un refrán para alguien que se siente {sentiment} "
-    }
+    sentiment_result = await sentiment_batcher.submit(request.message)
+    sentiment_label = sentiment_result['label']
 
-    prompt = prompts[request.preference].format(sentiment=sentiment_label)
-    
-    # Hacer la llamada a OpenAI GPT-4 con el prompt correspondiente
-    response = client.chat.completions.create(
-        model=_SETTINGS.model,
-        messages=[
-            {"role": "system", "content": "El siguiente es un consejo para alguien basado en su estado de ánimo."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7  # Puede ajustar esto según sea necesario
-    )
+    # Mapea la preferencia a un prompt específico; chistes y refranes van al modelo rápido
+    messages = build_suggestion_messages(request.preference, sentiment_label)
+    route = llm_gateway.suggestion_route(request.preference)
+
+    async def generate_recommendation():
+        return await llm_gateway.complete(route, messages)
+
+    # El prompt solo depende de la preferencia y la etiqueta, así que las respuestas se reutilizan
+    recommendation = await suggestion_cache.get((request.preference, sentiment_label), generate_recommendation)
 
-    recommendation = response.choices[0].message.content
-    
     return SuggestionResponse(recommendation=recommendation)
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from src.metrics import Histogram, observe_stage
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+# Agrupa las peticiones concurrentes de sentimiento en un único batch del modelo
+class SentimentBatcher:
+    def __init__(self, service_getter, max_batch_size, max_wait_ms):
+        self._get_service = service_getter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_BUCKETS)
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("El servicio de sentimiento se está deteniendo."))
+
+    async def submit(self, text, timings=None):
+        # Si se pasa timings, se rellena con la espera en cola y la duración del batch del modelo
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter(), timings))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+
+    async def _process(self, batch):
+        # Las peticiones cuyo cliente ya se desconectó no ocupan sitio en el batch
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        for _, _, enqueued_at, timings in batch:
+            self.queue_wait_histogram.observe(now - enqueued_at)
+            observe_stage("queue", now - enqueued_at)
+            if timings is not None:
+                timings["queue_time"] = now - enqueued_at
+        self.batch_size_histogram.observe(len(batch))
+
+        texts = [text for text, _, _, _ in batch]
+        try:
+            # El servicio se resuelve también en el executor: si aún no está cargado, la carga no bloquea el event loop
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._get_service().analyze_batch(texts)
+            )
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        model_time = time.perf_counter() - now
+        observe_stage("sentiment_batch", model_time)
+
+        for (_, future, _, timings), result in zip(batch, results):
+            if timings is not None:
+                timings["model_time"] = model_time
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+        }
@@ -0,0 +1,113 @@
+import logging
+from src.bot_state import create_state_store
+from src.rate_limit import create_rate_limiter
+from src.bot_messages import (
+    SENTIMENT_ERROR,
+    PERSONALIZED_ERROR,
+    SUGGESTION_ERROR,
+    UserLog,
+    construct_sentiment_reply
+)
+
+logger = logging.getLogger(__name__)
+
+# Flujo de la conversación común a los dos bots: qué paso queda pendiente en cada chat, el límite
+# por usuario y qué petición a la API corresponde a cada paso. Todas las llamadas son bloqueantes
+# (estado y user_log van a la base de datos); telegram_bot_async.py las ejecuta con asyncio.to_thread.
+
+
+# Petición a la API de un paso: ruta, cuerpo, cabeceras y cómo se convierte la respuesta en mensaje
+class ApiCall:
+    def __init__(self, path, payload, headers, error_message, build_reply=None, stream=False):
+        self.path = path
+        self.payload = payload
+        self.headers = headers
+        self.error_message = error_message
+        self.build_reply = build_reply
+        self.stream = stream
+
+
+def _sentiment_call(message, headers, log_id):
+    return ApiCall(
+        "sentiment", {"text": message.text, "log_id": log_id}, headers, SENTIMENT_ERROR,
+        build_reply=lambda sentiment_data: construct_sentiment_reply(sentiment_data, message.text)
+    )
+
+
+def _personalized_call(message, headers):
+    # La respuesta llega por tokens y el bot va editando un mensaje provisional
+    return ApiCall("personalized_response/stream", {"text": message.text}, headers, PERSONALIZED_ERROR, stream=True)
+
+
+def _suggestion_call(message, headers, preference):
+    return ApiCall(
+        "sugerencia", {"message": message.text, "preference": preference}, headers, SUGGESTION_ERROR,
+        build_reply=lambda suggestion: suggestion["recommendation"]
+    )
+
+
+# Pasos que llaman al modelo y a OpenAI; son también los que llevan límite por usuario de Telegram.
+# Se guardan por nombre para que el estado sea serializable.
+API_STEPS = {
+    "analyze_sentiment": _sentiment_call,
+    "personalized_response": _personalized_call,
+    "suggest_based_on_mood": _suggestion_call,
+}
+
+
+class PendingStep:
+    def __init__(self, name, data, limited=False, retry_after=None):
+        self.name = name
+        self.data = data
+        self.limited = limited
+        self.retry_after = retry_after
+
+
+def build_api_headers(settings, user_id):
+    # La API aplica su propio límite por cliente; así cada usuario tiene el suyo y no comparten el del bot
+    headers = {settings.rate_limit_client_header: f"telegram:{user_id}"}
+    if settings.rate_limit_client_secret:
+        headers[settings.rate_limit_secret_header] = settings.rate_limit_client_secret
+    return headers
+
+
+class BotConversation:
+    def __init__(self, settings, db_manager):
+        self.settings = settings
+        # Con SQLite o MySQL el paso pendiente lo comparten varias réplicas del bot
+        self.state_store = create_state_store(settings, db_manager)
+        self.rate_limiter = create_rate_limiter(settings)
+        self.user_log = UserLog(db_manager)
+
+    def log(self, message):
+        return self.user_log.log(message)
+
+    def is_known(self, user_id):
+        return self.user_log.is_known(user_id)
+
+    def log_command(self, message):
+        logger.info("Comando recibido.", extra={"user_id": message.from_user.id, "user_name": message.from_user.username, "command": message.text})
+
+    def begin(self, chat_id, step, data=None):
+        self.state_store.set(chat_id, step, data)
+
+    def remember_preference(self, message):
+        self.begin(message.chat.id, "suggest_based_on_mood", {"preference": message.text})
+
+    def claim_step(self, message):
+        # Saca el paso pendiente del chat; si el usuario superó su límite se conserva para que
+        # pueda reenviar el mismo mensaje más tarde y se devuelve con retry_after
+        state = self.state_store.pop(message.chat.id)
+        if state is None:
+            return None
+        step, data = state
+        if step in API_STEPS:
+            allowed, retry_after = self.rate_limiter.acquire(f"telegram:{message.from_user.id}", scope="bot")
+            if not allowed:
+                self.state_store.set(message.chat.id, step, data)
+                return PendingStep(step, data, limited=True, retry_after=retry_after)
+        return PendingStep(step, data)
+
+    def api_call(self, message, pending):
+        headers = build_api_headers(self.settings, message.from_user.id)
+        return API_STEPS[pending.name](message, headers, **pending.data)
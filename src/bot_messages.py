@@ -0,0 +1,137 @@
+import math
+import time
+from datetime import datetime
+from src.api_client import ApiError
+
+# Textos comunes de los dos bots (telegram_bot.py con hilos y telegram_bot_async.py con asyncio) y
+# cómo se convierte cada respuesta de la API en un mensaje; el flujo de la conversación está en
+# bot_conversation.py. Cada bot solo aporta su forma de llamar a Telegram, a la API y a la base de datos.
+
+PREFERENCES = ['libro', 'video de youtube', 'cancion', 'serie', 'chiste', 'refran']
+
+NOT_ALLOWED_MESSAGE = "No tienes permiso para usar este comando."
+SENTIMENT_PROMPT = "Por favor, envía el texto para el análisis de sentimiento."
+PERSONALIZED_PROMPT = "Por favor, envía un texto para generar un mensaje basado en tu estado de ánimo."
+PREFERENCE_PROMPT = "¿Qué te gustaría que te recomendara?"
+MOOD_PROMPT = "Por favor, envíame un mensaje sobre cómo te sientes."
+WRITING_MESSAGE = "Escribiendo..."
+
+STATUS_ERROR = "Error al obtener el estado del servicio."
+SENTIMENT_ERROR = "Error al realizar el análisis de sentimiento."
+PERSONALIZED_ERROR = "Error al generar la respuesta personalizada."
+SUGGESTION_ERROR = "Hubo un error al procesar tu solicitud."
+
+
+# Registra cada comando en user_log y recuerda los user_ids que ya tienen algún registro
+class UserLog:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.known_user_ids = set()
+
+    def log(self, message):
+        command_time = datetime.now()
+        data = (message.from_user.id, message.from_user.username, command_time, command_time.date(), message.text)
+        log_id = self.db_manager.insert_user_log(data)
+        if log_id is not None:
+            self.known_user_ids.add(message.from_user.id)
+        return log_id
+
+    def is_known(self, user_id):
+        if user_id in self.known_user_ids:
+            return True
+        # Consulta indexada por user_id en lugar de recorrer todo user_log con DISTINCT
+        if self.db_manager.user_exists(user_id):
+            self.known_user_ids.add(user_id)
+            return True
+        return False
+
+
+def build_api_error_reply(error, default_message):
+    if isinstance(error, ApiError):
+        return build_rate_limit_message(error.retry_after) if error.status_code == 429 else default_message
+    return f"Error al conectarse con la API: {error}"
+
+
+# Acumula los eventos NDJSON de /personalized_response/stream y decide cuándo editar el
+# mensaje provisional: Telegram limita las ediciones por chat, así que se agrupan los tokens
+class StreamedReply:
+    def __init__(self, edit_interval):
+        self.edit_interval = edit_interval
+        self.text = ""
+        self.shown = WRITING_MESSAGE
+        self._last_edit = time.monotonic()
+
+    def feed(self, event):
+        # Devuelve True cuando la respuesta ha terminado
+        if "error" in event:
+            self.text = event["error"]
+            return True
+        if event.get("done"):
+            self.text = event["message"]
+            return True
+        self.text += event["delta"]
+        return False
+
+    def pending_edit(self):
+        if time.monotonic() - self._last_edit < self.edit_interval or not self.text.strip():
+            return None
+        self._last_edit = time.monotonic()
+        return self.text if self.text != self.shown else None
+
+    def final_text(self):
+        return self.text if self.text.strip() else PERSONALIZED_ERROR
+
+
+def build_welcome_message(user_name):
+    return f"Hola {user_name}, bienvenido a tu virtual AI assistant que te ayudará a mejorar tu estado de ánimo y a encontrar recomendaciones personalizadas para ti, puedes ver los comandos disponibles con /help."
+
+
+def build_help_message(user_name):
+    return (
+        f"Hola {user_name}, aquí tienes ayuda sobre cómo utilizar el bot:\n\n"
+        "Comandos disponibles:\n"
+        "/start - Inicia la interacción con el bot y te da la bienvenida.\n"
+        "/help - Muestra esta ayuda.\n"
+        "/status - Obtiene el estado actual del servicio.\n"
+        "/sentiment - Inicia el proceso para analizar el sentimiento de un texto.\n"
+        "/amigo - Inicia el proceso para generar un mensaje personalizado basado en tu estado de ánimo.\n"
+        "/sugerencia - Inicia el proceso para obtener una sugerencia basada en tu estado de ánimo.\n\n"
+        "Si necesitas más información o asistencia, no dudes en escribir el comando correspondiente."
+    )
+
+
+def build_status_reply(status_data):
+    return f"Nombre del servicio: {status_data['service_name']}\n" \
+           f"Versión: {status_data['version']}\n" \
+           f"Nivel de log: {status_data['log_level']}\n" \
+           f"Modelos utilizados:\n" \
+           f"  - Sentiment Model: {status_data['models_info']['sentiment_model']}\n" \
+           f"  - NLP Model: {status_data['models_info']['nlp_model']}\n" \
+           f"  - GPT Model: {status_data['models_info']['gpt_model']}"
+
+
+def build_status_message(status_data, latency_stats):
+    return build_status_reply(status_data) + "\n" + build_api_latency_reply(latency_stats)
+
+
+def build_api_latency_reply(latency_stats):
+    # Latencia media hacia la API vista desde este proceso del bot, por endpoint
+    if not latency_stats:
+        return "Latencia de la API: sin peticiones todavía."
+    lines = ["Latencia de la API (media, peticiones):"]
+    for endpoint, stats in sorted(latency_stats.items()):
+        lines.append(f"  - {endpoint}: {stats['avg'] * 1000:.0f} ms ({stats['count']})")
+    return "\n".join(lines)
+
+
+def build_rate_limit_message(retry_after=None):
+    if retry_after:
+        return f"Estás enviando mensajes muy rápido. Inténtalo de nuevo en {math.ceil(float(retry_after))} segundos."
+    return "Estás enviando mensajes muy rápido. Inténtalo de nuevo en unos segundos."
+
+
+def construct_sentiment_reply(sentiment_data, text):
+    label = sentiment_data["prediction"]["label"]
+    score = sentiment_data["prediction"]["score"]
+    return f"Análisis de Sentimiento:\nTexto: {text}\nSentimiento: {label}\nPuntuación: {score}"
+
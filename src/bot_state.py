@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+# Estado de las conversaciones de varios mensajes (/sentiment, /amigo, /sugerencia).
+# Cada chat guarda solo el nombre del siguiente paso y sus datos en JSON, así que el estado
+# se puede compartir entre réplicas del bot y sobrevive a reinicios con los backends persistentes.
+class StateStore:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._last_purge = time.monotonic()
+
+    def set(self, chat_id, step, data=None):
+        self._set(chat_id, step, json.dumps(data or {}), time.time() + self.ttl)
+        if time.monotonic() - self._last_purge > self.ttl:
+            self._last_purge = time.monotonic()
+            self._purge(time.time())
+
+    def pop(self, chat_id):
+        # Lee y borra el estado de forma atómica: solo una réplica puede reclamar cada paso
+        row = self._claim(chat_id, time.time())
+        if row is None:
+            return None
+        step, data = row
+        return step, json.loads(data)
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self, ttl):
+        super().__init__(ttl)
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _set(self, chat_id, step, data, expires_at):
+        with self._lock:
+            self._states[chat_id] = (step, data, expires_at)
+
+    def _claim(self, chat_id, now):
+        with self._lock:
+            state = self._states.pop(chat_id, None)
+        if state is None or state[2] < now:
+            return None
+        return state[0], state[1]
+
+    def _purge(self, now):
+        with self._lock:
+            expired = [chat_id for chat_id, state in self._states.items() if state[2] < now]
+            for chat_id in expired:
+                del self._states[chat_id]
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, ttl, path):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL permite que varios procesos del bot compartan el mismo archivo
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS bot_state ("
+            "chat_id INTEGER PRIMARY KEY, step TEXT NOT NULL, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _set(self, chat_id, step, data, expires_at):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO bot_state (chat_id, step, data, expires_at) VALUES (?, ?, ?, ?)",
+                (chat_id, step, data, expires_at)
+            )
+
+    def _claim(self, chat_id, now):
+        with self._lock:
+            row = self._connection.execute(
+                "DELETE FROM bot_state WHERE chat_id = ? RETURNING step, data, expires_at", (chat_id,)
+            ).fetchone()
+        if row is None or row[2] < now:
+            return None
+        return row[0], row[1]
+
+    def _purge(self, now):
+        with self._lock:
+            self._connection.execute("DELETE FROM bot_state WHERE expires_at < ?", (now,))
+
+
+class MySQLStateStore(StateStore):
+    def __init__(self, ttl, db_manager):
+        super().__init__(ttl)
+        self._db_manager = db_manager
+
+    def _set(self, chat_id, step, data, expires_at):
+        self._db_manager.set_bot_state(chat_id, step, data, expires_at)
+
+    def _claim(self, chat_id, now):
+        return self._db_manager.claim_bot_state(chat_id, now)
+
+    def _purge(self, now):
+        self._db_manager.purge_bot_states(now)
+
+
+def create_state_store(settings, db_manager):
+    if settings.bot_state_backend == "sqlite":
+        return SQLiteStateStore(settings.bot_state_ttl, settings.bot_state_path)
+    if settings.bot_state_backend == "mysql":
+        return MySQLStateStore(settings.bot_state_ttl, db_manager)
+    return MemoryStateStore(settings.bot_state_ttl)
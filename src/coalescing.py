@@ -0,0 +1,34 @@
+import asyncio
+from src.metrics import REGISTRY
+
+COALESCED = REGISTRY.counter("assistbot_coalesced_requests_total", "Peticiones que reutilizaron una llamada idéntica ya en curso", labels=("name",))
+
+
+# Single-flight: las peticiones concurrentes con la misma clave esperan a una única llamada
+# en lugar de lanzar cada una la suya a OpenAI. La llamada corre en su propia tarea, así que
+# si la petición que la inició se cancela el resto sigue recibiendo el resultado.
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, produce):
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(produce())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            COALESCED.labels(self.name).inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def get_stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
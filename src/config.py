@@ -1,11 +1,14 @@
 from enum import Enum
 from functools import cache
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 
 class GPTModel(str, Enum):
     gpt_4 = "gpt-4"
     gpt_3_5_turbo = "gpt-3.5-turbo"
+    gpt_4o = "gpt-4o"
+    gpt_4o_mini = "gpt-4o-mini"
 
 # class SentimentModel(str, Enum):
 #     karina = "karina-aquino/spanish-sentiment-model"
@@ -14,16 +17,94 @@ class Settings(BaseSettings):
     service_name: str = "AssistBot API AI with Telegram TEST"
     k_revision: str = "local"
     log_level: str = "DEBUG"
+    log_format: str = "text"
     openai_key: str
     model: GPTModel = GPTModel.gpt_4
+    openai_base_url: Optional[str] = None
+    openai_max_concurrency: int = 8
+    openai_timeout: float = 30.0
+    openai_max_retries: int = 3
+    openai_fake: bool = False
+    openai_fake_latency: float = 0.5
+    llm_fast_model: GPTModel = GPTModel.gpt_4o_mini
+    llm_fast_preferences: List[str] = ["chiste", "refran"]
+    llm_personalized_max_tokens: int = 500
+    llm_suggestion_max_tokens: int = 300
+    llm_fast_max_tokens: int = 150
+    llm_json_mode: bool = True
+    suggestion_cache_size: int = 64
+    suggestion_cache_ttl: float = 3600.0
+    suggestion_cache_pool_size: int = 3
+    # memory: buckets por proceso, así que con N workers de gunicorn el límite efectivo es N veces mayor;
+    # sqlite: buckets compartidos por todos los procesos de la máquina en rate_limit_path
+    rate_limit_backend: str = "memory"
+    rate_limit_path: str = "rate_limit.sqlite3"
+    rate_limit_rate: float = 0.2
+    rate_limit_burst: int = 5
+    rate_limit_client_header: str = "X-Client-Id"
+    # Necesario con el bot: sin él la API ignora rate_limit_client_header y limita por IP
+    rate_limit_client_secret: Optional[str] = None
+    rate_limit_secret_header: str = "X-Client-Secret"
     telegram_token: str
     sentiment_model_id: str = "karina-aquino/spanish-sentiment-model"
+    sentiment_backend: str = "pytorch"
+    sentiment_onnx_dir: str = "models/onnx"
+    sentiment_intra_op_threads: int = 0
+    sentiment_inter_op_threads: int = 1
+    sentiment_max_tokens: int = 512
+    sentiment_window_stride: int = 64
+    sentiment_max_windows: int = 8
+    sentiment_long_text_strategy: str = "mean"
+    sentiment_max_text_length: int = 20000
+    sentiment_max_batch_items: int = 256
+    sentiment_max_upload_bytes: int = 8 * 1024 * 1024
+    sentiment_cache_size: int = 4096
+    sentiment_cache_path: Optional[str] = None
+    sentiment_batch_max_size: int = 16
+    sentiment_batch_max_wait_ms: float = 5.0
+    sentiment_batch_chunk_size: int = 32
+    web_workers: int = 0
+    web_threads_per_worker: int = 0
+    preload_models: bool = False
+    component_retry_interval: float = 1.0
+    component_retry_max_interval: float = 60.0
+    resource_sample_interval: float = 1.0
+    resource_sample_window: int = 10
+    status_refresh_interval: float = 30.0
+    metrics_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    nlp_model: str = "es_core_news_sm"
+    nlp_preload: bool = False
+    nlp_batch_size: int = 64
+    nlp_n_process: int = 1
+    nlp_exclude: List[str] = ["parser", "lemmatizer"]
     api_url: str
+    bot_stream_edit_interval: float = 1.0
+    bot_max_concurrency: int = 32
+    bot_api_pool_size: int = 20
+    bot_api_timeout: float = 60.0
+    bot_api_connect_timeout: float = 3.05
+    bot_api_retries: int = 3
+    bot_webhook_url: Optional[str] = None
+    bot_webhook_listen: str = "0.0.0.0"
+    bot_webhook_port: int = 8443
+    bot_webhook_secret: Optional[str] = None
+    bot_state_backend: str = "memory"
+    bot_state_path: str = "bot_state.sqlite3"
+    bot_state_ttl: float = 900.0
     db_host: str
     db_port: int
     db_user: str
     db_pass: str
     db_name: str
+    db_pool_size: int = 5
+    db_pool_timeout: float = 5.0
+    db_ping_interval: float = 30.0
+    db_retention_days: int = 30
+    db_retention_batch_size: int = 5000
+    telemetry_queue_size: int = 10000
+    telemetry_batch_size: int = 200
+    telemetry_flush_interval: float = 1.0
 
     class Config:
         env_file = ".env"
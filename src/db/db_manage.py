@@ -1,50 +1,269 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from src.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_INSERT_QUERY = """
+INSERT INTO sentiment (log_id, texto_analizado, label, score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+ANALYSIS_INSERT_QUERY = """
+INSERT INTO analysis (log_id, texto_analizado, pos_tags_resumen, pos_tags_conteo, ner_resumen, ner_conteo, sentimiento_label, sentimiento_score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+PERSONALIZED_RESPONSE_INSERT_QUERY = """
+INSERT INTO personalized_response (log_id, sentiment_label, response_message, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# La hora se trunca con TIMESTAMP/MAKETIME en lugar de DATE_FORMAT para no mezclar "%" con los parámetros
+SENTIMENT_HOURLY_ROLLUP_QUERY = """
+INSERT INTO sentiment_hourly (hora, label, modelos, total, score_total, tiempo_ejecucion_total, tiempo_ejecucion_max, longitud_texto_total)
+SELECT TIMESTAMP(DATE(fecha_hora), MAKETIME(HOUR(fecha_hora), 0, 0)) AS hora, label, modelos,
+       COUNT(*), SUM(score), SUM(tiempo_ejecucion), MAX(tiempo_ejecucion), SUM(longitud_texto)
+FROM sentiment
+WHERE fecha_hora >= %s AND fecha_hora < %s
+GROUP BY hora, label, modelos
+ON DUPLICATE KEY UPDATE
+    total = total + VALUES(total),
+    score_total = score_total + VALUES(score_total),
+    tiempo_ejecucion_total = tiempo_ejecucion_total + VALUES(tiempo_ejecucion_total),
+    tiempo_ejecucion_max = GREATEST(tiempo_ejecucion_max, VALUES(tiempo_ejecucion_max)),
+    longitud_texto_total = longitud_texto_total + VALUES(longitud_texto_total)
+"""
+
+SENTIMENT_USER_DAILY_ROLLUP_QUERY = """
+INSERT INTO sentiment_user_daily (dia, user_id, label, total, score_total)
+SELECT DATE(s.fecha_hora) AS dia, u.user_id, s.label, COUNT(*), SUM(s.score)
+FROM sentiment s JOIN user_log u ON u.log_id = s.log_id
+WHERE s.fecha_hora >= %s AND s.fecha_hora < %s
+GROUP BY dia, u.user_id, s.label
+ON DUPLICATE KEY UPDATE
+    total = total + VALUES(total),
+    score_total = score_total + VALUES(score_total)
+"""
+
+# Límites superiores (segundos) de los buckets de sentiment_latency_hourly; deben coincidir
+# con los de la migración 0004. El bucket i cubre [LATENCY_BUCKETS[i-1], LATENCY_BUCKETS[i]).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SENTIMENT_LATENCY_ROLLUP_QUERY = f"""
+INSERT INTO sentiment_latency_hourly (hora, modelos, bucket, total)
+SELECT TIMESTAMP(DATE(fecha_hora), MAKETIME(HOUR(fecha_hora), 0, 0)) AS hora, modelos,
+       INTERVAL(tiempo_ejecucion, {", ".join(str(bound) for bound in LATENCY_BUCKETS)}) AS bucket, COUNT(*)
+FROM sentiment
+WHERE fecha_hora >= %s AND fecha_hora < %s
+GROUP BY hora, modelos, bucket
+ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+"""
+
+SENTIMENT_ROLLUP_QUERIES = (SENTIMENT_HOURLY_ROLLUP_QUERY, SENTIMENT_USER_DAILY_ROLLUP_QUERY, SENTIMENT_LATENCY_ROLLUP_QUERY)
+
+# Conjuntos exportables desde /report: tabla, columna de tiempo y columnas en el orden de la clave primaria,
+# que es también el orden de paginación (keyset) para no usar OFFSET en rangos grandes
+REPORT_DATASETS = {
+    "labels": ("sentiment_hourly", "hora", ("hora", "label", "modelos"), ("total", "score_total", "tiempo_ejecucion_total", "tiempo_ejecucion_max", "longitud_texto_total")),
+    "users": ("sentiment_user_daily", "dia", ("dia", "user_id", "label"), ("total", "score_total")),
+    "latency": ("sentiment_latency_hourly", "hora", ("hora", "modelos", "bucket"), ("total",)),
+}
+
+# Tablas de filas crudas con fecha_hora que la retención puede vaciar
+RETENTION_TABLES = ("sentiment", "analysis", "personalized_response")
+
+
+class ConnectionPool:
+    def __init__(self, connect, size, timeout, ping_interval):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        # LIFO: se reutilizan primero las conexiones usadas más recientemente, que siguen calientes
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "errors": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def acquire(self):
+        start_time = time.perf_counter()
+        try:
+            connection, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            connection, last_used = self._open_or_wait()
+
+        waited = time.perf_counter() - start_time
+
+        # Solo se hace ping a las conexiones que llevan un rato sin usarse
+        if time.monotonic() - last_used > self.ping_interval and not connection.is_connected():
+            try:
+                connection.reconnect(attempts=3, delay=0.5)
+            except Error:
+                self._discard(connection)
+                self._count("errors")
+                raise
+            self._count("reconnects")
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        return connection
+
+    def _open_or_wait(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+
+            if can_create:
+                try:
+                    return self._connect(), time.monotonic()
+                except Error:
+                    with self._lock:
+                        self._created -= 1
+                        self._stats["errors"] += 1
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("timeouts")
+                raise PoolError(msg=f"Tiempo de espera agotado ({self.timeout}s) al obtener una conexión del pool.")
+            # Se despierta periódicamente por si se descartó una conexión rota y hay hueco para abrir otra
+            try:
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+
+    def release(self, connection, broken=False):
+        with self._lock:
+            self._stats["in_use"] -= 1
+        if broken:
+            self._discard(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["utilization"] = stats["in_use"] / self.size if self.size else 0.0
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
 
 class DatabaseManager:
-    def __init__(self, db_host, db_port, db_user, db_pass, db_name):
+    def __init__(self, db_host, db_port, db_user, db_pass, db_name, pool_size=5, pool_timeout=5.0, ping_interval=30.0, connect=True):
+        self._config = {
+            "host": db_host,
+            "port": db_port,
+            "user": db_user,
+            "passwd": db_pass,
+            "database": db_name,
+            # Con autocommit las conexiones reutilizadas no arrastran snapshots de lecturas anteriores
+            "autocommit": True,
+        }
+        self.pool = ConnectionPool(self._connect, pool_size, pool_timeout, ping_interval)
+        if connect:
+            try:
+                self.connect()
+            except Error as e:
+                logger.error("Error al conectar a MySQL: %s", e)
+
+    def connect(self):
+        # Abre la primera conexión del pool para validar credenciales y red
+        with self._connection():
+            logger.info("Conexión a la base de datos establecida.")
+        return self
+
+    def _connect(self):
+        return mysql.connector.connect(**self._config)
+
+    @contextmanager
+    def _connection(self):
+        connection = self.pool.acquire()
+        broken = False
         try:
-            self.connection = mysql.connector.connect(
-                host=db_host,
-                port=db_port,
-                user=db_user,
-                passwd=db_pass,
-                database=db_name
-            )
-            if self.connection.is_connected():
-                print("Conexión a la base de datos establecida.")
-        except Error as e:
-            print("Error al conectar a MySQL", e)
+            yield connection
+        except Error:
+            broken = not connection.is_connected()
+            raise
+        finally:
+            self.pool.release(connection, broken)
+
+    def get_pool_stats(self):
+        return self.pool.get_stats()
 
     def close_connection(self):
-        if self.connection.is_connected():
-            self.connection.close()
-            print("Conexión a la base de datos cerrada.")
+        self.pool.close_all()
+        logger.info("Conexiones a la base de datos cerradas.")
 
     def execute_query(self, query, data):
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, data)
-            self.connection.commit()
-            print(cursor.rowcount, "registro insertado.")
+            with self._connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(query, data)
+                connection.commit()
+                logger.debug("%s registro insertado.", cursor.rowcount)
         except Error as e:
-            print(f"Error al ejecutar la consulta: {e}")
+            logger.error("Error al ejecutar la consulta: %s", e)
 
     def insert_user_log(self, data):
-        print("Insertando registro en user_log...")
+        logger.debug("Insertando registro en user_log...")
         query = """
         INSERT INTO user_log (user_id, username, command_time, date, command)
         VALUES (%s, %s, %s, %s, %s)
         """
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, data)
-            self.connection.commit()
-            log_id = cursor.lastrowid
-            print("Registro insertado en user_log con log_id:", log_id)
-            return log_id
+            with self._connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(query, data)
+                connection.commit()
+                log_id = cursor.lastrowid
+                logger.debug("Registro insertado en user_log.", extra={"log_id": log_id})
+                return log_id
         except Error as e:
-            print(f"Error al ejecutar la consulta: {e}")
+            logger.error("Error al ejecutar la consulta: %s", e)
             return None
 
     def insert_status(self, data):
@@ -52,7 +271,7 @@ class DatabaseManager:
         existing_status = self.get_status()
         if existing_status is None:
             # Insertar nuevo registro
-            print("Insertando nuevo estado del servicio...")
+            logger.info("Insertando nuevo estado del servicio...")
             query = """
             INSERT INTO service_status (service_name, version, log_level, status, models_info)
             VALUES (%s, %s, %s, %s, %s)
@@ -60,7 +279,7 @@ class DatabaseManager:
             self.execute_query(query, (data['service_name'], data['version'], data['log_level'], data['status'], data['models_info']))
         else:
             # Opcional: Actualizar el registro existente
-            print("Actualizando estado del servicio existente...")
+            logger.info("Actualizando estado del servicio existente...")
             query = """
             UPDATE service_status
             SET service_name = %s, version = %s, log_level = %s, status = %s, models_info = %s
@@ -68,45 +287,48 @@ class DatabaseManager:
             """
             self.execute_query(query, (data['service_name'], data['version'], data['log_level'], data['status'], data['models_info'], existing_status['id']))
 
-            
+
     def insert_sentiment(self, log_id, texto_analizado, label, score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu):
-        query = """
-        INSERT INTO sentiment (log_id, texto_analizado, label, score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
         data = (log_id, texto_analizado, label, score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        self.execute_query(query, data)
+        self.execute_query(SENTIMENT_INSERT_QUERY, data)
 
     def insert_analysis(self, log_id, texto_analizado, pos_tags_resumen, pos_tags_conteo, ner_resumen, ner_conteo, sentimiento_label, sentimiento_score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu):
-        query = """
-        INSERT INTO analysis (log_id, texto_analizado, pos_tags_resumen, pos_tags_conteo, ner_resumen, ner_conteo, sentimiento_label, sentimiento_score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
         data = (log_id, texto_analizado, pos_tags_resumen, pos_tags_conteo, ner_resumen, ner_conteo, sentimiento_label, sentimiento_score, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        
+
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, data)
-            self.connection.commit()
-            print("Registro insertado en analysis con éxito.")
+            with self._connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(ANALYSIS_INSERT_QUERY, data)
+                connection.commit()
+                logger.debug("Registro insertado en analysis con éxito.")
         except Error as e:
-            print(f"Error al ejecutar la consulta: {e}")
+            logger.error("Error al ejecutar la consulta: %s", e)
 
     def get_user_ids(self):
-        print("Obteniendo user_ids...")
+        logger.debug("Obteniendo user_ids...")
         query = "SELECT DISTINCT user_id FROM user_log"
         user_ids = set()
         try:
-            with self.connection.cursor() as cursor:
+            with self._connection() as connection, connection.cursor() as cursor:
                 cursor.execute(query)
                 result = cursor.fetchall()
                 user_ids = {row[0] for row in result}
         except Error as e:
-            print(f"Error al obtener los user_ids: {e}")
+            logger.error("Error al obtener los user_ids: %s", e)
         return user_ids
-    
+
+    def user_exists(self, user_id):
+        query = "SELECT 1 FROM user_log WHERE user_id = %s LIMIT 1"
+        try:
+            with self._connection() as connection, connection.cursor() as cursor:
+                cursor.execute(query, (user_id,))
+                return cursor.fetchone() is not None
+        except Error as e:
+            logger.error("Error al comprobar el user_id: %s", e, extra={"user_id": user_id})
+            return False
+
     def get_log_id(self, user_id):
-        print(f"Obteniendo el último log_id para el user_id {user_id}...")
+        logger.debug("Obteniendo el último log_id.", extra={"user_id": user_id})
         query = """
         SELECT log_id FROM user_log
         WHERE user_id = %s
@@ -114,39 +336,204 @@ class DatabaseManager:
         LIMIT 1
         """
         try:
-            with self.connection.cursor() as cursor:
+            with self._connection() as connection, connection.cursor() as cursor:
                 cursor.execute(query, (user_id,))
                 result = cursor.fetchone()
                 if result:
                     return result[0]  # Retorna el log_id más reciente
                 else:
-                    print("No se encontraron registros de log para este user_id.")
+                    logger.info("No se encontraron registros de log para este user_id.", extra={"user_id": user_id})
                     return None
         except Error as e:
-            print(f"Error al obtener log_id: {e}")
+            logger.error("Error al obtener log_id: %s", e)
             return None
 
     def get_status(self):
         query = "SELECT * FROM service_status LIMIT 1"
         try:
-            with self.connection.cursor(dictionary=True) as cursor:
+            with self._connection() as connection, connection.cursor(dictionary=True) as cursor:
                 cursor.execute(query)
                 return cursor.fetchone()
         except Error as e:
-            print(f"Error al obtener el estado del servicio: {e}")
+            logger.error("Error al obtener el estado del servicio: %s", e)
             return None
 
     def insert_personalized_response(self, log_id, sentiment_label, response_message, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu):
-        query = """
-        INSERT INTO personalized_response (log_id, user_id, sentiment_label, response_message, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
         data = (log_id, sentiment_label, response_message, fecha_hora, tiempo_ejecucion, modelos, longitud_texto, uso_memoria, uso_cpu)
-        
+
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, data)
-            self.connection.commit()
-            print("Registro insertado en personalized_response con éxito.")
+            with self._connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(PERSONALIZED_RESPONSE_INSERT_QUERY, data)
+                connection.commit()
+                logger.debug("Registro insertado en personalized_response con éxito.")
         except Error as e:
-            print(f"Error al ejecutar la consulta: {e}")
\ No newline at end of file
+            logger.error("Error al ejecutar la consulta: %s", e)
+
+    def _bulk_insert(self, query, rows):
+        # executemany reescribe el INSERT como un único INSERT multi-fila
+        start_time = time.perf_counter()
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(query, rows)
+            connection.commit()
+        observe_stage("db_insert", time.perf_counter() - start_time)
+        return cursor.rowcount
+
+    def insert_sentiments(self, rows):
+        return self._bulk_insert(SENTIMENT_INSERT_QUERY, rows)
+
+    def insert_analyses(self, rows):
+        return self._bulk_insert(ANALYSIS_INSERT_QUERY, rows)
+
+    def insert_personalized_responses(self, rows):
+        return self._bulk_insert(PERSONALIZED_RESPONSE_INSERT_QUERY, rows)
+
+    def set_bot_state(self, chat_id, step, data, expires_at):
+        query = """
+        INSERT INTO bot_state (chat_id, step, data, expires_at) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE step = VALUES(step), data = VALUES(data), expires_at = VALUES(expires_at)
+        """
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, (chat_id, step, data, expires_at))
+
+    def claim_bot_state(self, chat_id, now):
+        # El DELETE condicionado a la fila leída hace de reclamo: si otra réplica ya la borró, rowcount es 0
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT step, data, expires_at FROM bot_state WHERE chat_id = %s", (chat_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            step, data, expires_at = row
+            cursor.execute(
+                "DELETE FROM bot_state WHERE chat_id = %s AND step = %s AND expires_at = %s",
+                (chat_id, step, expires_at)
+            )
+            if cursor.rowcount != 1 or expires_at < now:
+                return None
+            return step, data
+
+    def purge_bot_states(self, now):
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute("DELETE FROM bot_state WHERE expires_at < %s", (now,))
+            return cursor.rowcount
+
+    def get_applied_migrations(self):
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"
+            )
+            cursor.execute("SELECT version FROM schema_migrations")
+            return {row[0] for row in cursor.fetchall()}
+
+    def apply_migration(self, version, name, statements):
+        # MySQL confirma implícitamente cada DDL: si una sentencia falla la migración queda a medias
+        # y sin registrar, y hay que corregirla a mano antes de volver a ejecutar el migrador
+        with self._connection() as connection, connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, NOW())",
+                (version, name)
+            )
+
+    def rollup_sentiment(self, until):
+        # Agrega las horas completas desde la última ejecución hasta until en sentiment_hourly,
+        # sentiment_user_daily y sentiment_latency_hourly; devuelve (desde, hasta, filas de sentiment_hourly)
+        with self._connection() as connection, connection.cursor() as cursor:
+            connection.start_transaction()
+            try:
+                cursor.execute("SELECT rolled_until FROM rollup_state WHERE name = 'sentiment_hourly' FOR UPDATE")
+                row = cursor.fetchone()
+                if row is None or row[0] >= until:
+                    connection.rollback()
+                    return row and row[0], until, 0
+                since = row[0]
+                cursor.execute("SELECT MIN(fecha_hora) FROM sentiment WHERE fecha_hora >= %s", (since,))
+                oldest = cursor.fetchone()[0]
+                if oldest is None:
+                    connection.rollback()
+                    return since, until, 0
+                # Sin esto, la primera ejecución recorrería en vacío desde 1970
+                since = max(since, oldest.replace(minute=0, second=0, microsecond=0))
+                rows = 0
+                for query in SENTIMENT_ROLLUP_QUERIES:
+                    cursor.execute(query, (since, until))
+                    rows = rows or cursor.rowcount
+                cursor.execute("UPDATE rollup_state SET rolled_until = %s WHERE name = 'sentiment_hourly'", (until,))
+                connection.commit()
+                return since, until, rows
+            except Exception:
+                connection.rollback()
+                raise
+
+    def get_rollup_watermark(self, name):
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT rolled_until FROM rollup_state WHERE name = %s", (name,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_label_distribution(self, start, end):
+        query = """
+        SELECT DATE(hora) AS dia, label, SUM(total), SUM(score_total)
+        FROM sentiment_hourly
+        WHERE hora >= %s AND hora < %s
+        GROUP BY dia, label
+        ORDER BY dia, label
+        """
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, (start, end))
+            return cursor.fetchall()
+
+    def get_latency_buckets(self, start, end):
+        query = """
+        SELECT DATE(hora) AS dia, modelos, bucket, SUM(total)
+        FROM sentiment_latency_hourly
+        WHERE hora >= %s AND hora < %s
+        GROUP BY dia, modelos, bucket
+        ORDER BY dia, modelos, bucket
+        """
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, (start, end))
+            return cursor.fetchall()
+
+    def get_user_trend(self, user_id, start, end):
+        query = """
+        SELECT dia, label, total, score_total
+        FROM sentiment_user_daily
+        WHERE user_id = %s AND dia >= %s AND dia < %s
+        ORDER BY dia, label
+        """
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, (user_id, start, end))
+            return cursor.fetchall()
+
+    def get_report_page(self, dataset, start, end, after=None, limit=1000):
+        table, time_column, key_columns, value_columns = REPORT_DATASETS[dataset]
+        columns = ", ".join(key_columns + value_columns)
+        keys = ", ".join(key_columns)
+        conditions = f"{time_column} >= %s AND {time_column} < %s"
+        params = [start, end]
+        if after is not None:
+            conditions += f" AND ({keys}) > ({', '.join(['%s'] * len(key_columns))})"
+            params.extend(after)
+        query = f"SELECT {columns} FROM {table} WHERE {conditions} ORDER BY {keys} LIMIT %s"
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, params + [limit])
+            return cursor.fetchall()
+
+    def delete_rows_before(self, table, cutoff, batch_size):
+        # Borra por lotes para no mantener bloqueos largos ni generar un undo log enorme
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Tabla sin retención: {table}")
+        deleted = 0
+        with self._connection() as connection, connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE fecha_hora < %s ORDER BY fecha_hora LIMIT %s",
+                    (cutoff, batch_size)
+                )
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    return deleted
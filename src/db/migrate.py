@@ -0,0 +1,81 @@
+import argparse
+import logging
+import os
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+# Cada archivo NNNN_nombre.sql es una migración; se aplican en orden de versión y
+# schema_migrations registra las ya aplicadas
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE.match(file_name)
+        if match is None:
+            continue
+        with open(os.path.join(directory, file_name), encoding="utf-8") as migration_file:
+            statements = split_statements(migration_file.read())
+        migrations.append((int(match.group(1)), match.group(2), statements))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Hay versiones de migración repetidas en {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    # Las migraciones solo usan SQL plano: sin procedimientos ni ";" dentro de literales
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def pending_migrations(db_manager, directory=MIGRATIONS_DIR):
+    applied = db_manager.get_applied_migrations()
+    return [migration for migration in load_migrations(directory) if migration[0] not in applied]
+
+
+def migrate(db_manager, directory=MIGRATIONS_DIR):
+    applied = []
+    for version, name, statements in pending_migrations(db_manager, directory):
+        logger.info("Aplicando migración.", extra={"version": version, "migration": name})
+        db_manager.apply_migration(version, name, statements)
+        applied.append(version)
+    return applied
+
+
+def main():
+    from src.config import get_settings
+    from src.db.db_manage import DatabaseManager
+    from src.logs import configure_logging
+
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format)
+    parser = argparse.ArgumentParser(description="Aplica las migraciones pendientes del esquema de MySQL.")
+    parser.add_argument("--status", action="store_true", help="Solo muestra las migraciones pendientes")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(
+        settings.db_host, settings.db_port, settings.db_user, settings.db_pass, settings.db_name,
+        pool_size=1, connect=False
+    )
+    try:
+        if args.status:
+            for version, name, _ in pending_migrations(db_manager):
+                print(f"Pendiente: {version:04d}_{name}")
+            return
+        applied = migrate(db_manager)
+        print(f"Migraciones aplicadas: {len(applied)}")
+    except Exception as e:
+        logger.error("Error al migrar la base de datos: %s", e)
+        sys.exit(1)
+    finally:
+        db_manager.close_connection()
+
+
+if __name__ == "__main__":
+    main()
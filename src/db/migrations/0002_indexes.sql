@@ -0,0 +1,11 @@
+-- Los ids de usuario de Telegram ya no caben en un INT de 32 bits.
+-- (user_id, command_time) resuelve user_exists y get_log_id (último comando del usuario)
+-- sin recorrer user_log, y permite a DISTINCT user_id usar un loose index scan.
+ALTER TABLE user_log
+    MODIFY user_id BIGINT NOT NULL,
+    ADD INDEX idx_user_log_user_time (user_id, command_time);
+
+-- fecha_hora es la columna por la que filtran el rollup y la retención
+CREATE INDEX idx_sentiment_fecha_hora ON sentiment (fecha_hora);
+CREATE INDEX idx_analysis_fecha_hora ON analysis (fecha_hora);
+CREATE INDEX idx_personalized_response_fecha_hora ON personalized_response (fecha_hora);
@@ -0,0 +1,22 @@
+-- Agregados por hora de la tabla sentiment. Sobreviven a la retención de las filas crudas
+-- y son la fuente de los informes históricos.
+CREATE TABLE IF NOT EXISTS sentiment_hourly (
+    hora DATETIME NOT NULL,
+    label VARCHAR(50) NOT NULL,
+    modelos VARCHAR(255) NOT NULL,
+    total INT NOT NULL,
+    score_total DOUBLE NOT NULL,
+    tiempo_ejecucion_total DOUBLE NOT NULL,
+    tiempo_ejecucion_max FLOAT NOT NULL,
+    longitud_texto_total BIGINT NOT NULL,
+    PRIMARY KEY (hora, label, modelos)
+);
+
+-- Hasta dónde se ha agregado cada rollup; la fila se bloquea con FOR UPDATE mientras se agrega,
+-- así que dos ejecuciones simultáneas de la retención no cuentan dos veces la misma hora
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name VARCHAR(64) PRIMARY KEY,
+    rolled_until DATETIME NOT NULL
+);
+
+INSERT IGNORE INTO rollup_state (name, rolled_until) VALUES ('sentiment_hourly', '1970-01-01 00:00:00');
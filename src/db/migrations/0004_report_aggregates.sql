@@ -0,0 +1,36 @@
+-- Agregados para /report, mantenidos por la misma pasada de rollup que sentiment_hourly.
+
+-- Tendencia de ánimo por usuario y día
+CREATE TABLE IF NOT EXISTS sentiment_user_daily (
+    dia DATE NOT NULL,
+    user_id BIGINT NOT NULL,
+    label VARCHAR(50) NOT NULL,
+    total INT NOT NULL,
+    score_total DOUBLE NOT NULL,
+    PRIMARY KEY (dia, user_id, label),
+    INDEX idx_sentiment_user_daily_user (user_id, dia)
+);
+
+-- Histograma de tiempo_ejecucion por hora y modelo: bucket es el índice devuelto por INTERVAL()
+-- sobre LATENCY_BUCKETS de src/db/db_manage.py, y de él salen p50 y p95 sin leer las filas crudas
+CREATE TABLE IF NOT EXISTS sentiment_latency_hourly (
+    hora DATETIME NOT NULL,
+    modelos VARCHAR(255) NOT NULL,
+    bucket SMALLINT NOT NULL,
+    total INT NOT NULL,
+    PRIMARY KEY (hora, modelos, bucket)
+);
+
+-- Las horas ya agregadas en sentiment_hourly se rellenan con las filas crudas que aún se conservan
+INSERT INTO sentiment_user_daily (dia, user_id, label, total, score_total)
+SELECT DATE(s.fecha_hora), u.user_id, s.label, COUNT(*), SUM(s.score)
+FROM sentiment s JOIN user_log u ON u.log_id = s.log_id
+WHERE s.fecha_hora < (SELECT rolled_until FROM rollup_state WHERE name = 'sentiment_hourly')
+GROUP BY DATE(s.fecha_hora), u.user_id, s.label;
+
+INSERT INTO sentiment_latency_hourly (hora, modelos, bucket, total)
+SELECT TIMESTAMP(DATE(fecha_hora), MAKETIME(HOUR(fecha_hora), 0, 0)) AS hora, modelos,
+       INTERVAL(tiempo_ejecucion, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) AS bucket, COUNT(*)
+FROM sentiment
+WHERE fecha_hora < (SELECT rolled_until FROM rollup_state WHERE name = 'sentiment_hourly')
+GROUP BY hora, modelos, bucket;
@@ -0,0 +1,64 @@
+import argparse
+import logging
+import sys
+from datetime import datetime, timedelta
+from src.db.db_manage import RETENTION_TABLES
+
+logger = logging.getLogger(__name__)
+
+
+def run_retention(db_manager, retention_days, batch_size=5000, grace_minutes=5, now=None):
+    now = now or datetime.now()
+    # Solo se agregan horas cerradas; el margen deja llegar las filas que la telemetría aún tiene en cola
+    until = (now - timedelta(minutes=grace_minutes)).replace(minute=0, second=0, microsecond=0)
+    since, until, rollup_rows = db_manager.rollup_sentiment(until)
+
+    # Nunca se borran filas de sentiment que aún no estén agregadas
+    watermark = db_manager.get_rollup_watermark("sentiment_hourly") or datetime.min
+    cutoff = now - timedelta(days=retention_days)
+    deleted = {}
+    for table in RETENTION_TABLES:
+        table_cutoff = min(cutoff, watermark) if table == "sentiment" else cutoff
+        deleted[table] = db_manager.delete_rows_before(table, table_cutoff, batch_size)
+
+    report = {
+        "rollup_since": since,
+        "rollup_until": until,
+        "rollup_rows": rollup_rows,
+        "cutoff": cutoff,
+        "deleted": deleted,
+    }
+    logger.info("Retención completada.", extra={"rollup_rows": rollup_rows, "deleted": deleted})
+    return report
+
+
+def main():
+    from src.config import get_settings
+    from src.db.db_manage import DatabaseManager
+    from src.logs import configure_logging
+
+    settings = get_settings()
+    configure_logging(settings.log_level, settings.log_format)
+    parser = argparse.ArgumentParser(description="Agrega sentiment por horas y borra las filas crudas antiguas. Pensado para ejecutarse desde cron.")
+    parser.add_argument("--days", type=int, default=settings.db_retention_days, help="Días de filas crudas que se conservan")
+    parser.add_argument("--batch-size", type=int, default=settings.db_retention_batch_size)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(
+        settings.db_host, settings.db_port, settings.db_user, settings.db_pass, settings.db_name,
+        pool_size=1, connect=False
+    )
+    try:
+        report = run_retention(db_manager, args.days, args.batch_size)
+    except Exception as e:
+        logger.error("Error en la retención: %s", e)
+        sys.exit(1)
+    finally:
+        db_manager.close_connection()
+    print(f"Horas agregadas: {report['rollup_since']} - {report['rollup_until']} ({report['rollup_rows']} filas)")
+    for table, count in report["deleted"].items():
+        print(f"Filas borradas de {table}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import logging
+import queue
+import threading
+import time
+from mysql.connector import DataError, Error, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def insert_rows(bulk_insert, rows):
+    # Si el INSERT multi-fila falla por datos (clave duplicada, log_id inexistente, valor fuera de rango)
+    # se repite fila a fila para descartar solo las malas. Devuelve los índices de las filas rechazadas;
+    # los errores de conexión se propagan.
+    try:
+        bulk_insert(rows)
+        return []
+    except (IntegrityError, DataError) as e:
+        if len(rows) == 1:
+            logger.warning("Registro rechazado por la base de datos: %s", e)
+            return [0]
+    rejected = []
+    for index, row in enumerate(rows):
+        try:
+            bulk_insert([row])
+        except (IntegrityError, DataError) as e:
+            logger.warning("Registro rechazado por la base de datos: %s", e, extra={"row": index})
+            rejected.append(index)
+    return rejected
+
+
+# Cola en memoria que persiste la telemetría en segundo plano con INSERTs multi-fila,
+# para que las peticiones no esperen el round-trip ni el commit de MySQL
+class WriteBehindWriter:
+    def __init__(self, db_manager, max_queue_size=10000, batch_size=200, flush_interval=1.0):
+        self._bulk_writers = {
+            "sentiment": db_manager.insert_sentiments,
+            "analysis": db_manager.insert_analyses,
+            "personalized_response": db_manager.insert_personalized_responses,
+        }
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10.0):
+        if self._thread is None:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def insert_sentiment(self, *row):
+        self._enqueue("sentiment", row)
+
+    def insert_analysis(self, *row):
+        self._enqueue("analysis", row)
+
+    def insert_personalized_response(self, *row):
+        self._enqueue("personalized_response", row)
+
+    def _enqueue(self, table, row):
+        # Se llama desde el event loop: nunca espera ni escribe en MySQL, si no se puede encolar se descarta
+        if self._closed:
+            self._count("dropped")
+            logger.warning("Telemetría ya cerrada, se descartó un registro.", extra={"table": table})
+            return
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Cola de telemetría llena, se descartó un registro.", extra={"table": table})
+            return
+        self._count("enqueued")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        rows_by_table = {}
+        for table, row in batch:
+            rows_by_table.setdefault(table, []).append(row)
+
+        for table, rows in rows_by_table.items():
+            try:
+                rejected = insert_rows(self._bulk_writers[table], rows)
+            except Error as e:
+                self._count("failed", len(rows))
+                logger.error("Error al escribir registros: %s", e, extra={"table": table, "rows": len(rows)})
+                continue
+            if rejected:
+                self._count("failed", len(rejected))
+                logger.error("Registros descartados por la base de datos.", extra={"table": table, "rows": len(rejected)})
+            self._count("written", len(rows) - len(rejected))
+        self._count("flushes")
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
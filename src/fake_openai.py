@@ -0,0 +1,78 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Error simulado de OpenAI con código {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+# Sustituto sin red de openai.AsyncOpenAI para pruebas y desarrollo local.
+# Expone la misma forma de respuesta que el SDK: choices[0].message.content y usage.
+class FakeAsyncOpenAI:
+    def __init__(self, latency=0.0, content=None):
+        self.latency = latency
+        self.content = content
+        self.calls = []
+        self._pending_errors = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def fail_next(self, status_code, times=1):
+        self._pending_errors.extend([status_code] * times)
+
+    async def _create(self, model, messages, timeout=None, stream=False, **kwargs):
+        self.calls.append({"model": model, "messages": messages, "stream": stream, **kwargs})
+        if self._pending_errors:
+            raise FakeStatusError(self._pending_errors.pop(0))
+
+        content = self._content(messages)
+        usage = self._usage(messages, content)
+        if stream:
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return self._stream(content, usage if include_usage else None)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                message=SimpleNamespace(role="assistant", content=content),
+                finish_reason="stop"
+            )],
+            usage=usage
+        )
+
+    def _usage(self, messages, content):
+        prompt_tokens = sum(len(message["content"].split()) for message in messages)
+        completion_tokens = len(content.split())
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+
+    def _content(self, messages):
+        if self.content is not None:
+            return self.content
+        return json.dumps({
+            "mensaje": "Respuesta simulada",
+            "entrada": messages[-1]["content"],
+        }, ensure_ascii=False)
+
+    async def _stream(self, content, usage=None):
+        # La latencia total se reparte entre los fragmentos, como en un streaming real
+        words = content.split(" ")
+        delay = self.latency / len(words)
+        for index, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay)
+            piece = word if index == len(words) - 1 else word + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece), finish_reason=None)], usage=None)
+        if usage is not None:
+            # Con stream_options={"include_usage": True} el SDK envía un último fragmento sin choices
+            yield SimpleNamespace(choices=[], usage=usage)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentUnavailable(RuntimeError):
+    def __init__(self, name, error):
+        super().__init__(f"El componente {name} no se pudo cargar: {error}")
+        self.name = name
+
+
+class Component:
+    def __init__(self, name, loader, eager):
+        self.name = name
+        self.loader = loader
+        self.eager = eager
+        self.state = "pending" if eager else "lazy"
+        self.value = None
+        self.load_time = None
+        self.error = None
+        self.lock = threading.Lock()
+
+
+# Registro de componentes pesados (modelos, clientes, conexiones). Los "eager" se cargan en
+# paralelo al arrancar; el resto solo la primera vez que algún endpoint los pide.
+class ComponentRegistry:
+    def __init__(self, retry_interval=1.0, retry_max_interval=60.0):
+        self._components = {}
+        self._listeners = []
+        self._startup_task = None
+        self._retry_task = None
+        self.retry_interval = retry_interval
+        self.retry_max_interval = retry_max_interval
+        self.started_at = None
+        self.startup_time = None
+        self.cold_start_time = None
+
+    def register(self, name, loader, eager=True):
+        self._components[name] = Component(name, loader, eager)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def get(self, name):
+        component = self._components[name]
+        if component.state != "ready":
+            self._load(component)
+        if component.state == "failed":
+            raise ComponentUnavailable(name, component.error)
+        return component.value
+
+    def peek(self, name):
+        # Devuelve el componente solo si ya está cargado, sin provocar su carga
+        component = self._components[name]
+        return component.value if component.state == "ready" else None
+
+    async def aget(self, name):
+        component = self._components[name]
+        if component.state == "ready":
+            return component.value
+        return await asyncio.to_thread(self.get, name)
+
+    def _load(self, component):
+        with component.lock:
+            if component.state == "ready":
+                return
+            component.state = "loading"
+            start_time = time.perf_counter()
+            try:
+                component.value = component.loader()
+            except Exception as e:
+                component.state = "failed"
+                component.error = str(e)
+                logger.exception("Error al cargar el componente.", extra={"component": component.name})
+            else:
+                component.state = "ready"
+                component.error = None
+            component.load_time = time.perf_counter() - start_time
+            logger.info(
+                "Componente cargado." if component.state == "ready" else "Componente no disponible.",
+                extra={"component": component.name, "state": component.state, "load_time": round(component.load_time, 3)}
+            )
+        for listener in self._listeners:
+            listener(component)
+
+    def start(self):
+        # La carga corre en segundo plano para que /ready y /status respondan mientras tanto
+        if self._startup_task is None:
+            self._startup_task = asyncio.create_task(self._start())
+        if self._retry_task is None and self.retry_interval > 0:
+            self._retry_task = asyncio.create_task(self._retry_loop())
+
+    async def _start(self):
+        self.started_at = time.perf_counter()
+        eager = [component for component in self._components.values() if component.eager]
+        await asyncio.gather(*(asyncio.to_thread(self._load, component) for component in eager))
+        self.startup_time = time.perf_counter() - self.started_at
+        # Desde que arrancó el proceso (imports incluidos) hasta tener todo cargado
+        self.cold_start_time = time.time() - psutil.Process(os.getpid()).create_time()
+        logger.info(
+            "Arranque completado.",
+            extra={"startup_time": round(self.startup_time, 3), "cold_start_time": round(self.cold_start_time, 3)}
+        )
+
+    async def stop(self):
+        for task in (self._retry_task, self._startup_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._retry_task = None
+
+    async def _retry_loop(self):
+        # Un fallo transitorio al arrancar (p. ej. la base de datos aún no acepta conexiones) no debe dejar
+        # el servicio sin servir para siempre: se reintenta en segundo plano con espera exponencial
+        await asyncio.shield(self._startup_task)
+        delay = self.retry_interval
+        while True:
+            await asyncio.sleep(delay)
+            if not self.has_failed():
+                delay = self.retry_interval
+                continue
+            await asyncio.to_thread(self.retry_failed)
+            delay = self.retry_interval if not self.has_failed() else min(delay * 2, self.retry_max_interval)
+
+    def has_failed(self):
+        return any(component.eager and component.state == "failed" for component in self._components.values())
+
+    def retry_failed(self):
+        for component in self._components.values():
+            if component.eager and component.state == "failed":
+                self._load(component)
+
+    def is_ready(self):
+        return all(component.state == "ready" for component in self._components.values() if component.eager)
+
+    def get_report(self):
+        return {
+            "ready": self.is_ready(),
+            "startup_time": self.startup_time,
+            "cold_start_time": self.cold_start_time,
+            "components": {
+                component.name: {
+                    "state": component.state,
+                    "eager": component.eager,
+                    "load_time": component.load_time,
+                    "error": component.error,
+                }
+                for component in self._components.values()
+            },
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import random
+import time
+import openai
+from src.metrics import REGISTRY, observe_stage
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+OPENAI_TOKENS = REGISTRY.counter("assistbot_openai_tokens_total", "Tokens consumidos en OpenAI según response.usage", labels=("model", "type"))
+OPENAI_REQUESTS = REGISTRY.counter("assistbot_openai_requests_total", "Llamadas a OpenAI por resultado", labels=("model", "outcome"))
+
+
+# Cliente asíncrono de OpenAI con límite de llamadas concurrentes, timeout por llamada
+# y reintentos con backoff exponencial y jitter ante 429/5xx
+class LLMClient:
+    def __init__(self, client, max_concurrency=8, timeout=30.0, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self._client = client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def chat(self, **kwargs):
+        model = _model_name(kwargs.get("model"))
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                # El semáforo se libera durante la espera entre reintentos
+                async with self._semaphore:
+                    response = await self._client.chat.completions.create(timeout=self.timeout, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    OPENAI_REQUESTS.labels(model, "error").inc()
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                OPENAI_REQUESTS.labels(model, "retry").inc()
+                logger.warning(
+                    "Error de OpenAI, se reintenta: %s", e,
+                    extra={"attempt": attempt, "max_retries": self.max_retries, "delay": round(delay, 2)}
+                )
+                await asyncio.sleep(delay)
+                continue
+            # La espera incluye la cola del semáforo y los reintentos
+            observe_stage("openai", time.perf_counter() - start_time)
+            OPENAI_REQUESTS.labels(model, "ok").inc()
+            record_usage(model, getattr(response, "usage", None))
+            return response
+
+    async def stream_chat(self, on_usage=None, **kwargs):
+        model = _model_name(kwargs.get("model"))
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._semaphore:
+                    # include_usage añade un último fragmento sin choices con el consumo de tokens
+                    stream = await self._client.chat.completions.create(
+                        timeout=self.timeout, stream=True, stream_options={"include_usage": True}, **kwargs
+                    )
+                    async for chunk in stream:
+                        usage = getattr(chunk, "usage", None)
+                        record_usage(model, usage)
+                        if usage is not None and on_usage is not None:
+                            on_usage(usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if not started:
+                                observe_stage("openai_first_token", time.perf_counter() - start_time)
+                            started = True
+                            yield delta
+                observe_stage("openai", time.perf_counter() - start_time)
+                OPENAI_REQUESTS.labels(model, "ok").inc()
+                return
+            except Exception as e:
+                # Una vez enviados tokens al cliente ya no se puede reintentar desde cero
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    OPENAI_REQUESTS.labels(model, "error").inc()
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                OPENAI_REQUESTS.labels(model, "retry").inc()
+                logger.warning(
+                    "Error de OpenAI, se reintenta: %s", e,
+                    extra={"attempt": attempt, "max_retries": self.max_retries, "delay": round(delay, 2)}
+                )
+                await asyncio.sleep(delay)
+
+    def _backoff(self, attempt, error):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: evita que todos los workers reintenten a la vez
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+def _model_name(model):
+    # GPTModel es un Enum: en las etiquetas va su valor ("gpt-4"), no "GPTModel.gpt_4"
+    return str(getattr(model, "value", model))
+
+
+def record_usage(model, usage):
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    OPENAI_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code in RETRYABLE_STATUS_CODES or status_code >= 500)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def create_llm_client(settings):
+    if settings.openai_fake:
+        from src.fake_openai import FakeAsyncOpenAI
+        client = FakeAsyncOpenAI(latency=settings.openai_fake_latency)
+    else:
+        # Los reintentos los gestiona LLMClient, no el SDK
+        client = openai.AsyncOpenAI(
+            api_key=settings.openai_key,
+            base_url=settings.openai_base_url,
+            timeout=settings.openai_timeout,
+            max_retries=0
+        )
+
+    return LLMClient(
+        client,
+        max_concurrency=settings.openai_max_concurrency,
+        timeout=settings.openai_timeout,
+        max_retries=settings.openai_max_retries
+    )
@@ -0,0 +1,167 @@
+import json
+import logging
+import time
+from src.config import GPTModel
+from src.llm import _model_name
+from src.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ROUTE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LLM_ROUTE_SECONDS = REGISTRY.histogram("assistbot_llm_route_seconds", "Duración de las llamadas a OpenAI por ruta y modelo", ROUTE_BUCKETS, labels=("route", "model"))
+LLM_ROUTE_TOKENS = REGISTRY.counter("assistbot_llm_route_tokens_total", "Tokens por ruta (prompt, completion y prompt servido desde la caché del proveedor)", labels=("route", "type"))
+LLM_ROUTE_FINISH = REGISTRY.counter("assistbot_llm_route_finish_total", "Motivo de fin de las respuestas por ruta; length indica que se alcanzó max_tokens", labels=("route", "finish_reason"))
+LLM_INVALID_JSON = REGISTRY.counter("assistbot_llm_invalid_json_total", "Respuestas que debían ser JSON y no lo eran; se devuelven como texto", labels=("route",))
+
+# Modelos que aceptan response_format={"type": "json_object"}; gpt-4 (8k) no lo admite
+# y con él la respuesta en JSON se sigue pidiendo solo en las instrucciones
+JSON_MODE_MODELS = {GPTModel.gpt_4o, GPTModel.gpt_4o_mini, GPTModel.gpt_3_5_turbo}
+
+# Las instrucciones fijas van siempre primero y sin variables: OpenAI reutiliza el prefijo
+# común de las peticiones (caché de prompt), así que todo lo que cambia va al final
+PERSONALIZED_SYSTEM_PROMPT = (
+    "Genera una respuesta basada en el sentimiento del usuario y responde siempre en español, "
+    "ademas dale proverbios y refranes o algun chiste de acuerdo a su emocion, al final siempre "
+    "recomiendale una cancion de acuerdo a su emocion, recuerda dar la respuesta en JSON "
+    "con las claves \"mensaje\", \"refran\" y \"cancion\"."
+)
+
+SUGGESTION_SYSTEM_PROMPT = (
+    "El siguiente es un consejo para alguien basado en su estado de ánimo. "
+    "Responde siempre en español, de forma breve y directa."
+)
+
+SUGGESTION_PROMPTS = {
+    'libro': "Recomienda un libro para alguien que se siente {sentiment} y explica por qué lo recomiendas.",
+    'video de youtube': "Recomienda un video de YouTube para alguien que se siente {sentiment} y explica por qué lo recomiendas.",
+    'cancion': "Recomienda una canción para alguien que se siente {sentiment} y explica por qué la recomiendas",
+    'serie': "Recomienda una serie para alguien que se siente {sentiment} y explica por qué la recomiendas y en que plataforma se puede ver.",
+    'chiste': "Dime un chiste para alguien que se siente {sentiment}, trata de que tu chiste no sea muy basico o muy malo, usa tu poder para navegar en internet y encontrar un buen chiste.",
+    'refran': "Comparte un refrán para alguien que se siente {sentiment} "
+}
+
+
+def build_personalized_messages(prompt, user_text):
+    return [
+        {"role": "system", "content": PERSONALIZED_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+        {"role": "user", "content": user_text},  # El texto del usuario, lo único que cambia siempre, al final
+    ]
+
+
+def build_suggestion_messages(preference, sentiment_label):
+    return [
+        {"role": "system", "content": SUGGESTION_SYSTEM_PROMPT},
+        {"role": "user", "content": SUGGESTION_PROMPTS[preference].format(sentiment=sentiment_label)},
+    ]
+
+
+class Route:
+    def __init__(self, name, model, max_tokens, temperature=0.7, json_output=False):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.json_output = json_output
+
+
+# Elige modelo, límite de tokens y formato de salida según el tipo de petición,
+# y contabiliza latencia y tokens por ruta
+class LLMGateway:
+    def __init__(self, get_client, routes, fast_preferences=()):
+        self._get_client = get_client
+        self.routes = {route.name: route for route in routes}
+        self.fast_preferences = set(fast_preferences)
+        # Con el MODEL por defecto (gpt-4) es lo esperado: se informa una vez al crear el gateway
+        for route in routes:
+            if route.json_output and route.model not in JSON_MODE_MODELS:
+                logger.info(
+                    "Ruta sin modo JSON: el JSON se pide en las instrucciones y la respuesta se valida al recibirla.",
+                    extra={"route": route.name, "model": _model_name(route.model)}
+                )
+
+    def suggestion_route(self, preference):
+        # Chistes y refranes son respuestas cortas que no necesitan el modelo grande
+        return "suggestion_fast" if preference in self.fast_preferences else "suggestion"
+
+    def request_options(self, route_name, messages):
+        route = self.routes[route_name]
+        options = {
+            "model": route.model,
+            "messages": messages,
+            "temperature": route.temperature,
+            "max_tokens": route.max_tokens,
+        }
+        if route.json_output and route.model in JSON_MODE_MODELS:
+            options["response_format"] = {"type": "json_object"}
+        return options
+
+    async def complete(self, route_name, messages):
+        options = self.request_options(route_name, messages)
+        client = await self._get_client()
+        start_time = time.perf_counter()
+        response = await client.chat(**options)
+        self._observe(route_name, options["model"], time.perf_counter() - start_time)
+        record_route_usage(route_name, getattr(response, "usage", None))
+        finish_reason = response.choices[0].finish_reason or "unknown"
+        LLM_ROUTE_FINISH.labels(route_name, finish_reason).inc()
+        if finish_reason == "length":
+            logger.warning("Respuesta de OpenAI cortada por max_tokens", extra={"route": route_name, "max_tokens": options["max_tokens"]})
+        return self.check_reply(route_name, response.choices[0].message.content)
+
+    def check_reply(self, route_name, content):
+        # Sin modo JSON (gpt-4) o con la respuesta cortada el JSON puede venir mal formado o entre ```;
+        # si no es válido se avisa y se devuelve el texto tal cual en lugar de fallar
+        if not self.routes[route_name].json_output or content is None:
+            return content
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`").removeprefix("json").strip()
+        try:
+            json.loads(text)
+        except ValueError:
+            LLM_INVALID_JSON.labels(route_name).inc()
+            logger.warning("La respuesta de OpenAI no es JSON válido, se devuelve como texto.", extra={"route": route_name})
+            return content
+        return text
+
+    async def stream(self, route_name, messages):
+        options = self.request_options(route_name, messages)
+        client = await self._get_client()
+        start_time = time.perf_counter()
+        async for delta in client.stream_chat(on_usage=lambda usage: record_route_usage(route_name, usage), **options):
+            yield delta
+        self._observe(route_name, options["model"], time.perf_counter() - start_time)
+
+    def _observe(self, route_name, model, seconds):
+        LLM_ROUTE_SECONDS.labels(route_name, _model_name(model)).observe(seconds)
+
+    def get_routes(self):
+        return {
+            name: {
+                "model": _model_name(route.model),
+                "max_tokens": route.max_tokens,
+                "json_mode": route.json_output and route.model in JSON_MODE_MODELS,
+            }
+            for name, route in self.routes.items()
+        }
+
+
+def record_route_usage(route_name, usage):
+    if usage is None:
+        return
+    LLM_ROUTE_TOKENS.labels(route_name, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_ROUTE_TOKENS.labels(route_name, "completion").inc(usage.completion_tokens or 0)
+    # cached_tokens indica cuánto del prompt se sirvió desde la caché de OpenAI (prefijos de 1024+ tokens)
+    details = getattr(usage, "prompt_tokens_details", None)
+    LLM_ROUTE_TOKENS.labels(route_name, "cached").inc(getattr(details, "cached_tokens", None) or 0)
+
+
+def create_llm_gateway(settings, get_client):
+    routes = [
+        Route("personalized", settings.model, settings.llm_personalized_max_tokens, json_output=settings.llm_json_mode),
+        Route("suggestion", settings.model, settings.llm_suggestion_max_tokens),
+        Route("suggestion_fast", settings.llm_fast_model, settings.llm_fast_max_tokens),
+    ]
+    return LLMGateway(get_client, routes, settings.llm_fast_preferences)
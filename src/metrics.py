@@ -0,0 +1,185 @@
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Las métricas se actualizan sin locks: bajo el GIL un incremento perdido entre hilos es
+# posible pero raro, y no compensa pagar un lock en cada petición para evitarlo.
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+# Una métrica con nombre y etiquetas; cada combinación de valores de etiquetas es un hijo
+class MetricFamily:
+    def __init__(self, name, kind, documentation, label_names, factory):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._factory())
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.label_names, values))
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(child.buckets, child.counts):
+                    cumulative += count
+                    yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+                yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, child.count
+                yield f"{self.name}_sum", labels, child.sum
+                yield f"{self.name}_count", labels, child.count
+            else:
+                yield self.name, labels, child.value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(name, "counter", documentation, labels, Counter)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(name, "gauge", documentation, labels, Gauge)
+
+    def histogram(self, name, documentation, buckets, labels=()):
+        return self._register(name, "histogram", documentation, labels, lambda: Histogram(buckets))
+
+    def _register(self, name, kind, documentation, labels, factory):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families.setdefault(name, MetricFamily(name, kind, documentation, labels, factory))
+        return family
+
+    def register_collector(self, collect):
+        # collect() devuelve [(nombre, tipo, descripción, [(etiquetas, valor), ...])] y se llama en cada /metrics;
+        # sirve para exponer estadísticas que ya calculan otros componentes (pool, cachés, colas)
+        self._collectors.append(collect)
+
+    def collect(self):
+        # [(nombre, tipo, descripción, [(nombre de la muestra, etiquetas, valor), ...])]
+        families = [
+            (family.name, family.kind, family.documentation, list(family.samples()))
+            for family in list(self._families.values())
+        ]
+        for collect in self._collectors:
+            try:
+                collected = collect()
+            except Exception as e:
+                logger.warning("Error al recoger métricas: %s", e, extra={"collector": getattr(collect, "__name__", str(collect))})
+                continue
+            for name, kind, documentation, samples in collected:
+                families.append((name, kind, documentation, [(name, labels, value) for labels, value in samples]))
+        return families
+
+    def render(self):
+        return render_families(self.collect())
+
+
+def render_families(families):
+    # Las familias con el mismo nombre (p. ej. una por worker) se agrupan bajo un único HELP/TYPE
+    merged = {}
+    for name, kind, documentation, samples in families:
+        if name in merged:
+            merged[name][2].extend(samples)
+        else:
+            merged[name] = (kind, documentation, list(samples))
+    lines = []
+    for name, (kind, documentation, samples) in merged.items():
+        _render_family(lines, name, kind, documentation, samples)
+    return "\n".join(lines) + "\n"
+
+
+def _render_family(lines, name, kind, documentation, samples):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {kind}")
+    for sample_name, labels, value in samples:
+        if labels:
+            rendered = ",".join(f'{key}="{_escape(value_)}"' for key, value_ in labels.items())
+            lines.append(f"{sample_name}{{{rendered}}} {_format_value(value)}")
+        else:
+            lines.append(f"{sample_name} {_format_value(value)}")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "assistbot_stage_seconds",
+    "Duración de cada etapa del procesamiento (cola, tokenizado, forward del modelo, inserción en BD, OpenAI)",
+    STAGE_BUCKETS,
+    labels=("stage",)
+)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
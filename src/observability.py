@@ -0,0 +1,46 @@
+import time
+from src.metrics import REGISTRY
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# Middleware ASGI (sin BaseHTTPMiddleware, que añade una tarea por petición) que mide la duración
+# de cada petición por método, ruta y código de respuesta, y cuántas hay en curso.
+# En las respuestas en streaming la duración llega hasta el último fragmento enviado.
+class MetricsMiddleware:
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.requests = registry.histogram(
+            "assistbot_http_request_duration_seconds",
+            "Duración de las peticiones HTTP",
+            REQUEST_BUCKETS,
+            labels=("method", "endpoint", "status")
+        )
+        self.in_flight = registry.gauge(
+            "assistbot_http_requests_in_flight",
+            "Peticiones HTTP en curso"
+        ).labels()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            # Se etiqueta con la plantilla de la ruta, no con la URL, para no disparar la cardinalidad
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            self.requests.labels(scope["method"], endpoint, str(status_code)).observe(time.perf_counter() - start_time)
@@ -0,0 +1,128 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from src.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = REGISTRY.counter("assistbot_rate_limited_total", "Peticiones rechazadas por el limitador de ritmo", labels=("scope",))
+
+
+# Limitador token bucket: cada clave (usuario de Telegram, cliente de la API) dispone de hasta
+# "burst" peticiones seguidas y recupera "rate" por segundo. Quien lo supera recibe cuántos
+# segundos debe esperar en lugar de encolar más trabajo en el modelo y en OpenAI.
+class RateLimiter:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # Un bucket sin usar durante este tiempo ya está lleno y se puede olvidar
+        self.idle_ttl = burst / rate if rate > 0 else 0
+        self._last_purge = time.monotonic()
+
+    def acquire(self, key, scope="api", cost=1):
+        if self.rate <= 0:
+            return True, 0.0
+        now = time.time()
+        allowed, retry_after = self._take(key, cost, now)
+        if not allowed:
+            RATE_LIMITED.labels(scope).inc()
+        if time.monotonic() - self._last_purge > self.idle_ttl:
+            self._last_purge = time.monotonic()
+            self._purge(now - self.idle_ttl)
+        return allowed, retry_after
+
+    def _refill(self, tokens, updated_at, now):
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def _consume(self, tokens, cost):
+        # Devuelve (permitido, tokens restantes, segundos hasta poder pagar el coste)
+        if tokens >= cost:
+            return True, tokens - cost, 0.0
+        return False, tokens, (cost - tokens) / self.rate
+
+
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _take(self, key, cost, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            allowed, tokens, retry_after = self._consume(self._refill(tokens, updated_at, now), cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+    def _purge(self, idle_before):
+        with self._lock:
+            idle = [key for key, bucket in self._buckets.items() if bucket[1] < idle_before]
+            for key in idle:
+                del self._buckets[key]
+
+
+# Comparte los buckets entre los workers de gunicorn y las réplicas del bot de la misma máquina
+class SQLiteRateLimiter(RateLimiter):
+    def __init__(self, rate, burst, path):
+        super().__init__(rate, burst)
+        self._lock = threading.Lock()
+        self._path = path
+        self._connection = None
+        self._pid = None
+
+    def _db(self):
+        # Una conexión SQLite no se puede usar tras un fork: cada worker abre la suya
+        if self._connection is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit ("
+                "bucket_key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+        return self._connection
+
+    def _take(self, key, cost, now):
+        with self._lock:
+            connection = self._db()
+            # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer: ningún otro proceso
+            # puede gastar los mismos tokens entre la lectura y la escritura
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT tokens, updated_at FROM rate_limit WHERE bucket_key = ?", (key,)).fetchone()
+                tokens, updated_at = row if row is not None else (self.burst, now)
+                allowed, tokens, retry_after = self._consume(self._refill(tokens, updated_at, now), cost)
+                connection.execute(
+                    "INSERT OR REPLACE INTO rate_limit (bucket_key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, tokens, now)
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def _purge(self, idle_before):
+        with self._lock:
+            self._db().execute("DELETE FROM rate_limit WHERE updated_at < ?", (idle_before,))
+
+
+def check_client_secret(settings):
+    # Sin secreto compartido la API ignora el identificador que envía el bot y todos sus usuarios
+    # comparten el bucket de la IP del bot: RATE_LIMIT_BURST peticiones para todos a la vez
+    if settings.rate_limit_rate > 0 and not settings.rate_limit_client_secret:
+        logger.error(
+            "RATE_LIMIT_CLIENT_SECRET no está definido: todos los usuarios del bot compartirán el límite de la API. "
+            "Defina el mismo secreto en la API y en el bot."
+        )
+        return False
+    return True
+
+
+def create_rate_limiter(settings):
+    if settings.rate_limit_backend == "sqlite":
+        return SQLiteRateLimiter(settings.rate_limit_rate, settings.rate_limit_burst, settings.rate_limit_path)
+    return MemoryRateLimiter(settings.rate_limit_rate, settings.rate_limit_burst)
@@ -0,0 +1,168 @@
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from src.db.db_manage import LATENCY_BUCKETS, REPORT_DATASETS
+
+# Los informes se calculan solo a partir de las tablas agregadas que mantiene src/db/retention.py
+# (sentiment_hourly, sentiment_user_daily, sentiment_latency_hourly), nunca de las filas crudas:
+# el coste depende del número de días del rango, no de cuántos análisis hubo.
+
+
+def day_range(start, end):
+    # Rango de días inclusivo en la API, semiabierto [start, end + 1) en las consultas
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+
+def bucket_percentile(counts, quantile, bounds=LATENCY_BUCKETS):
+    # Igual que histogram_quantile de Prometheus: interpolación lineal dentro del bucket.
+    # counts[i] es el bucket que devuelve INTERVAL(); el último no tiene límite superior.
+    total = sum(counts)
+    if total == 0:
+        return None
+    target = quantile * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= target:
+            if index >= len(bounds):
+                return bounds[-1]
+            lower = bounds[index - 1] if index > 0 else 0.0
+            return lower + (bounds[index] - lower) * (target - cumulative) / count
+        cumulative += count
+    return bounds[-1]
+
+
+def _label_value(label):
+    try:
+        return float(label)
+    except ValueError:
+        return None
+
+
+def label_distribution(rows):
+    days = {}
+    totals = {}
+    for day, label, total, score_total in rows:
+        entry = days.setdefault(day, {"date": day.isoformat(), "total": 0, "labels": {}, "score_total": 0.0})
+        entry["total"] += int(total)
+        entry["labels"][label] = int(total)
+        entry["score_total"] += float(score_total)
+        totals[label] = totals.get(label, 0) + int(total)
+    result = []
+    for entry in days.values():
+        score_total = entry.pop("score_total")
+        entry["avg_score"] = score_total / entry["total"] if entry["total"] else 0.0
+        result.append(entry)
+    return result, totals
+
+
+def latency_report(rows, quantiles=(0.5, 0.95)):
+    groups = {}
+    for day, model, bucket, total in rows:
+        counts = groups.setdefault((day, model), [0] * (len(LATENCY_BUCKETS) + 1))
+        counts[min(int(bucket), len(LATENCY_BUCKETS))] += int(total)
+    result = []
+    for (day, model), counts in groups.items():
+        entry = {"date": day.isoformat(), "model": model, "total": sum(counts)}
+        for quantile in quantiles:
+            entry[f"p{round(quantile * 100)}"] = bucket_percentile(counts, quantile)
+        result.append(entry)
+    return result
+
+
+def user_trend(rows):
+    # avg_label es la media de la etiqueta (1 a 5 estrellas en el modelo por defecto): la tendencia de ánimo
+    days = {}
+    for day, label, total, score_total in rows:
+        entry = days.setdefault(day, {"date": day.isoformat(), "total": 0, "labels": {}, "score_total": 0.0, "label_total": 0.0, "numeric": 0})
+        entry["total"] += int(total)
+        entry["labels"][label] = int(total)
+        entry["score_total"] += float(score_total)
+        value = _label_value(label)
+        if value is not None:
+            entry["label_total"] += value * int(total)
+            entry["numeric"] += int(total)
+    result = []
+    for entry in days.values():
+        score_total = entry.pop("score_total")
+        label_total = entry.pop("label_total")
+        numeric = entry.pop("numeric")
+        entry["avg_score"] = score_total / entry["total"] if entry["total"] else 0.0
+        entry["avg_label"] = label_total / numeric if numeric else None
+        result.append(entry)
+    return result
+
+
+def dataset_columns(dataset):
+    _, _, key_columns, value_columns = REPORT_DATASETS[dataset]
+    return list(key_columns + value_columns)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps([_json_value(value) for value in key]).encode()).decode()
+
+
+def decode_cursor(dataset, cursor):
+    # Las columnas de tiempo de la clave vuelven a ser datetime/date para compararlas en MySQL.
+    # El cursor llega del cliente: cualquier fallo al decodificarlo es un cursor inválido (422), no un 500
+    _, time_column, key_columns, _ = REPORT_DATASETS[dataset]
+    parse = datetime.fromisoformat if time_column == "hora" else date.fromisoformat
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(key, list) or len(key) != len(key_columns):
+            raise ValueError("Cursor inválido")
+        return [parse(value) if column == time_column else value for column, value in zip(key_columns, key)]
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def report_page(db_manager, dataset, start, end, cursor=None, limit=1000):
+    after = decode_cursor(dataset, cursor) if cursor else None
+    columns = dataset_columns(dataset)
+    rows = db_manager.get_report_page(dataset, start, end, after, limit)
+    key_length = len(REPORT_DATASETS[dataset][2])
+    next_cursor = encode_cursor(rows[-1][:key_length]) if len(rows) == limit else None
+    return {
+        "rows": [{column: _json_value(value) for column, value in zip(columns, row)} for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def iter_report_rows(db_manager, dataset, start, end, page_size=1000):
+    # Recorre el rango por páginas de la clave primaria: memoria constante sea cual sea el rango
+    key_length = len(REPORT_DATASETS[dataset][2])
+    after = None
+    while True:
+        rows = db_manager.get_report_page(dataset, start, end, after, page_size)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = list(rows[-1][:key_length])
+
+
+def stream_csv(db_manager, dataset, start, end, page_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset_columns(dataset))
+    for row in iter_report_rows(db_manager, dataset, start, end, page_size):
+        writer.writerow([_json_value(value) for value in row])
+        # Se envía en trozos de unos 64 KB en lugar de una línea por escritura
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(db_manager, dataset, start, end, page_size=1000):
+    columns = dataset_columns(dataset)
+    for row in iter_report_rows(db_manager, dataset, start, end, page_size):
+        yield json.dumps({column: _json_value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
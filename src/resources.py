@@ -0,0 +1,87 @@
+import os
+import threading
+from collections import deque
+import psutil
+
+
+# Muestrea CPU y memoria del proceso en segundo plano; los handlers leen la última foto sin esperar
+class ResourceSampler:
+    def __init__(self, interval=1.0, window=10):
+        self.interval = interval
+        self._process = psutil.Process(os.getpid())
+        self._cpu_samples = deque(maxlen=window)
+        self._snapshot = (self._process.memory_info().rss, 0.0)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Con gunicorn --preload el objeto se crea en el maestro: cada worker mide su propio proceso
+        if self._process.pid != os.getpid():
+            self._process = psutil.Process(os.getpid())
+        # La primera llamada sin intervalo solo fija la referencia para las siguientes
+        self._process.cpu_percent(interval=None)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self._cpu_samples.append(self._process.cpu_percent(interval=None))
+        cpu_usage = sum(self._cpu_samples) / len(self._cpu_samples)
+        # Se reemplaza la tupla completa para que los lectores nunca vean una foto a medias
+        self._snapshot = (self._process.memory_info().rss, cpu_usage)
+
+    def snapshot(self):
+        return self._snapshot
+
+
+def process_memory(process):
+    # USS es la memoria exclusiva del proceso y PSS reparte las páginas compartidas entre quienes las usan
+    info = process.memory_full_info()
+    return {
+        "pid": process.pid,
+        "rss": info.rss,
+        "uss": getattr(info, "uss", None),
+        "pss": getattr(info, "pss", None),
+        "shared": getattr(info, "shared", None),
+    }
+
+
+def worker_memory_report():
+    current = psutil.Process(os.getpid())
+    parent = current.parent()
+    # Bajo gunicorn los workers son hijos del maestro y se informa de todos; si no, solo de este proceso
+    if parent is not None and any("gunicorn" in part for part in parent.cmdline()):
+        master = process_memory(parent)
+        workers = []
+        for child in parent.children():
+            try:
+                workers.append(process_memory(child))
+            except psutil.NoSuchProcess:
+                # Un worker que se está reciclando
+                continue
+    else:
+        master = None
+        workers = [process_memory(current)]
+
+    processes = workers + ([master] if master else [])
+    return {
+        "current_pid": current.pid,
+        "master": master,
+        "workers": workers,
+        # La suma de RSS cuenta varias veces las páginas compartidas; la de PSS no
+        "total_rss": sum(process["rss"] for process in processes),
+        "total_pss": sum(process["pss"] or 0 for process in processes),
+        "total_uss": sum(process["uss"] or 0 for process in processes),
+    }
@@ -1,5 +1,13 @@
-from pydantic import BaseModel
-from typing import List, Dict, Union
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional, Union
+from src.bot_messages import PREFERENCES
+from src.config import get_settings
+
+_SETTINGS = get_settings()
+
+# Los límites se validan antes de llegar al modelo: un texto o un lote enorme no puede acaparar un worker
+MAX_TEXT_LENGTH = _SETTINGS.sentiment_max_text_length
+MAX_BATCH_ITEMS = _SETTINGS.sentiment_max_batch_items
 
 class CombinedReportResponse(BaseModel):
     nombre_archivo: str
@@ -29,22 +37,85 @@ class StatusResponse(BaseModel):
     models_info: Dict[str, str]
 
 class SentimentRequest(BaseModel):
-    text: str
+    text: str = Field(..., max_length=MAX_TEXT_LENGTH)
     log_id: int
 
+class SentimentBatchItem(BaseModel):
+    text: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    log_id: int
+
+class SentimentBatchRequest(BaseModel):
+    items: List[SentimentBatchItem] = Field(..., max_length=MAX_BATCH_ITEMS)
+
+class SentimentBatchResponse(BaseModel):
+    results: List[SentimentAnalysisResponse]
+    execution_info: Dict[str, Union[float, str]]
+
 class AnalysisRequest(BaseModel):
-    text: str
+    text: str = Field(..., max_length=MAX_TEXT_LENGTH)
     log_id: int
 
+class AnalysisBatchRequest(BaseModel):
+    items: List[AnalysisRequest] = Field(..., max_length=MAX_BATCH_ITEMS)
+
+class AnalysisBatchResponse(BaseModel):
+    results: List[TextAnalysisResponse]
+    execution_info: Dict[str, Union[float, str]]
+
 class PersonalizedResponse(BaseModel):
     message: str
 
 class PersonalizedRequest(BaseModel):
-    text: str
+    text: str = Field(..., max_length=MAX_TEXT_LENGTH)
 
 class SuggestionRequest(BaseModel):
-    message: str
-    preference: str
+    message: str = Field(..., max_length=MAX_TEXT_LENGTH)
+    # Solo las preferencias que ofrece el bot: forman parte de la clave de la caché de sugerencias
+    preference: Literal[tuple(PREFERENCES)]
 
 class SuggestionResponse(BaseModel):
-    recommendation: str
\ No newline at end of file
+    recommendation: str
+
+class LabelDistributionDay(BaseModel):
+    date: str
+    total: int
+    labels: Dict[str, int]
+    avg_score: float
+
+class LabelDistributionResponse(BaseModel):
+    start: str
+    end: str
+    data_until: Optional[str]
+    totals: Dict[str, int]
+    days: List[LabelDistributionDay]
+
+class LatencyReportRow(BaseModel):
+    date: str
+    model: str
+    total: int
+    p50: Optional[float]
+    p95: Optional[float]
+
+class LatencyReportResponse(BaseModel):
+    start: str
+    end: str
+    data_until: Optional[str]
+    rows: List[LatencyReportRow]
+
+class UserTrendDay(BaseModel):
+    date: str
+    total: int
+    labels: Dict[str, int]
+    avg_score: float
+    avg_label: Optional[float]
+
+class UserTrendResponse(BaseModel):
+    user_id: int
+    start: str
+    end: str
+    data_until: Optional[str]
+    days: List[UserTrendDay]
+
+class ReportPageResponse(BaseModel):
+    rows: List[Dict[str, Union[int, float, str]]]
+    next_cursor: Optional[str]
@@ -1,12 +1,175 @@
-from transformers import pipeline
+import os
+import time
+import threading
+import psutil
 from src.config import get_settings
+from src.sentiment_cache import SentimentCache
 
 _SETTINGS = get_settings()
 
+LONG_TEXT_STRATEGIES = ("mean", "weighted", "max")
+
 
 class SentimentAnalysisService:
     def __init__(self):
-        self.sentiment_pipe = pipeline("text-classification", model=_SETTINGS.sentiment_model_id)
+        # transformers se importa aquí para no pagar su importación al importar la app
+        from src.sentiment_backends import instrument_pipeline, load_sentiment_pipeline
+
+        process = psutil.Process(os.getpid())
+        rss_before = process.memory_info().rss
+        start_time = time.perf_counter()
+
+        self.model_id = _SETTINGS.sentiment_model_id
+        self.backend = _SETTINGS.sentiment_backend
+        self.sentiment_pipe = load_sentiment_pipeline(
+            self.model_id,
+            self.backend,
+            onnx_dir=_SETTINGS.sentiment_onnx_dir,
+            intra_op_threads=_SETTINGS.sentiment_intra_op_threads,
+            inter_op_threads=_SETTINGS.sentiment_inter_op_threads
+        )
+        # El wrapper de ONNX ya mide sus etapas; en los pipelines de transformers se envuelven los métodos
+        if self.backend != "onnx":
+            instrument_pipeline(self.sentiment_pipe)
+
+        # Ventanas de tokens para textos largos: nunca más de lo que admite el modelo
+        tokenizer = self.sentiment_pipe.tokenizer
+        model_max_length = getattr(tokenizer, "model_max_length", None) or _SETTINGS.sentiment_max_tokens
+        self.max_tokens = min(_SETTINGS.sentiment_max_tokens, model_max_length)
+        self.window_tokens = self.max_tokens - tokenizer.num_special_tokens_to_add()
+        self.window_stride = min(_SETTINGS.sentiment_window_stride, self.window_tokens // 2)
+        self.max_windows = _SETTINGS.sentiment_max_windows
+        if _SETTINGS.sentiment_long_text_strategy not in LONG_TEXT_STRATEGIES:
+            raise ValueError(f"Estrategia desconocida: {_SETTINGS.sentiment_long_text_strategy}. Opciones: {', '.join(LONG_TEXT_STRATEGIES)}")
+        self.long_text_strategy = _SETTINGS.sentiment_long_text_strategy
+
+        # Con SENTIMENT_CACHE_SIZE=0 todas las predicciones pasan por el modelo. La clave incluye todo lo que
+        # cambia la predicción, para no servir desde la caché en disco resultados calculados con otras ventanas
+        self.cache = None
+        if _SETTINGS.sentiment_cache_size > 0:
+            self.cache = SentimentCache(
+                f"{self.model_id}@{self.backend}:{self.long_text_strategy}:{self.max_tokens}:{self.window_stride}:{self.max_windows}",
+                max_entries=_SETTINGS.sentiment_cache_size,
+                disk_path=_SETTINGS.sentiment_cache_path
+            )
+
+        # Los tokenizers rápidos no admiten llamadas concurrentes ("Already borrowed") y el batcher no es el
+        # único que llama al modelo (/analysis, /sentiment/batch, warmup): tokenizar e inferir van bajo un solo lock
+        self._lock = threading.Lock()
+
+        self.load_time = time.perf_counter() - start_time
+        self.model_memory = max(process.memory_info().rss - rss_before, 0)
 
     def analyze_sentiment(self, text):
-        return self.sentiment_pipe(text)
\ No newline at end of file
+        return self.analyze_batch([text])
+
+    def analyze_batch(self, texts):
+        if self.cache is None:
+            return self._predict(texts)
+        results = self.cache.get_many(texts)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            # Los textos que se normalizan igual dentro del mismo batch solo pasan una vez por el modelo
+            keys = {index: self.cache.key(texts[index]) for index in missing}
+            unique = {}
+            for index in missing:
+                unique.setdefault(keys[index], texts[index])
+            predictions = self._predict(list(unique.values()))
+            self.cache.put_many(list(unique.values()), predictions)
+            by_key = dict(zip(unique.keys(), predictions))
+            for index in missing:
+                results[index] = dict(by_key[keys[index]])
+        return results
+
+    def _predict(self, texts):
+        # Cada texto se parte en ventanas de tokens; todas las ventanas del batch pasan juntas por el
+        # modelo y después se combinan en una sola etiqueta por texto. El pipeline rellena (padding)
+        # las ventanas hasta la longitud de la más larga, que nunca supera max_tokens.
+        windows = []
+        owners = []
+        with self._lock:
+            for index, text in enumerate(texts):
+                for window, weight in split_windows(self.sentiment_pipe.tokenizer, text, self.window_tokens, self.window_stride, self.max_windows):
+                    windows.append(window)
+                    owners.append((index, weight))
+
+            # top_k=None devuelve la probabilidad de todas las etiquetas, necesaria para promediar ventanas
+            scores = self.sentiment_pipe(windows, batch_size=len(windows), top_k=None, truncation=True, max_length=self.max_tokens)
+        per_text = [[] for _ in texts]
+        for (index, weight), window_scores in zip(owners, scores):
+            per_text[index].append((window_scores, weight))
+        return [aggregate_windows(text_windows, self.long_text_strategy) for text_windows in per_text]
+
+    def get_cache_stats(self):
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+
+    def warmup(self):
+        # La primera inferencia inicializa los kernels; mejor pagarla al arrancar que en la primera petición
+        with self._lock:
+            self.sentiment_pipe("hola")
+
+    def get_info(self):
+        return {
+            "sentiment_backend": self.backend,
+            "sentiment_max_tokens": str(self.max_tokens),
+            "sentiment_long_text_strategy": self.long_text_strategy,
+            "sentiment_model_load_time": f"{self.load_time:.2f}s",
+            "sentiment_model_memory": f"{self.model_memory / (1024 * 1024):.1f}MB",
+        }
+
+
+def split_windows(tokenizer, text, window_tokens, stride, max_windows):
+    # Devuelve [(texto de la ventana, número de tokens)]. Cada token ocupa al menos un carácter,
+    # así que los textos con menos caracteres que la ventana no necesitan tokenizarse aquí.
+    if len(text) <= window_tokens:
+        return [(text, len(text))]
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)["offset_mapping"]
+    if len(offsets) <= window_tokens:
+        return [(text, len(offsets))]
+
+    step = window_tokens - stride
+    starts = list(range(0, len(offsets) - stride, step))
+    if len(starts) > max_windows:
+        # Se reparten las ventanas por todo el texto en lugar de quedarse solo con el principio
+        last = len(offsets) - window_tokens
+        starts = [round(last * position / (max_windows - 1)) for position in range(max_windows)] if max_windows > 1 else [0]
+    windows = []
+    for start in starts:
+        end = min(start + window_tokens, len(offsets))
+        windows.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+    return windows
+
+
+def aggregate_windows(windows, strategy="mean"):
+    # windows: [(lista de {label, score} con todas las etiquetas, peso)]
+    if len(windows) == 1 or strategy == "max":
+        # max: la ventana con la predicción más segura decide la etiqueta
+        best = max((max(scores, key=lambda item: item["score"]) for scores, _ in windows), key=lambda item: item["score"])
+        return {"label": best["label"], "score": best["score"]}
+
+    # mean: todas las ventanas pesan igual; weighted: según su número de tokens
+    totals = {}
+    weight_sum = 0.0
+    for scores, weight in windows:
+        weight = weight if strategy == "weighted" else 1
+        weight_sum += weight
+        for item in scores:
+            totals[item["label"]] = totals.get(item["label"], 0.0) + item["score"] * weight
+    label = max(totals, key=totals.get)
+    return {"label": label, "score": totals[label] / weight_sum}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_sentiment_service():
+    # Un único modelo por proceso, compartido por todos los endpoints
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SentimentAnalysisService()
+    return _service
@@ -0,0 +1,191 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from src.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pytorch", "pytorch-int8", "onnx")
+
+# Frases de referencia para comprobar que un backend da las mismas etiquetas que el fp32
+PARITY_TEXTS = [
+    "Hoy es un día maravilloso, me siento muy feliz.",
+    "Estoy muy cansado y nada me sale bien.",
+    "La película estuvo bien, aunque un poco larga.",
+    "Odio cuando el autobús llega tarde.",
+    "Gracias por tu ayuda, de verdad lo aprecio.",
+    "No sé qué pensar sobre lo que pasó ayer.",
+    "Me encanta pasar tiempo con mi familia los domingos.",
+    "El servicio fue pésimo y la comida estaba fría.",
+    "Mañana tengo un examen y estoy nervioso.",
+    "Qué buena noticia, por fin conseguí el trabajo.",
+]
+
+
+def load_sentiment_pipeline(model_id, backend="pytorch", onnx_dir="models/onnx", intra_op_threads=0, inter_op_threads=1):
+    # Devuelve un objeto invocable como el pipeline de transformers: texto o lista de textos -> [{label, score}]
+    from transformers import pipeline
+
+    if backend == "pytorch":
+        return pipeline("text-classification", model=model_id)
+    if backend == "pytorch-int8":
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+        # Solo se cuantizan las capas lineales, que concentran casi todo el cómputo del encoder
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("text-classification", model=model, tokenizer=AutoTokenizer.from_pretrained(model_id))
+    if backend == "onnx":
+        return OnnxSentimentPipeline(model_id, onnx_dir, intra_op_threads, inter_op_threads)
+    raise ValueError(f"Backend de sentimiento desconocido: {backend}. Opciones: {', '.join(BACKENDS)}")
+
+
+def instrument_pipeline(pipe):
+    # Mide por separado el tokenizado y el forward del modelo sustituyendo los métodos de la instancia
+    for method_name, stage in (("preprocess", "tokenize"), ("_forward", "forward")):
+        method = getattr(pipe, method_name, None)
+        if method is not None:
+            setattr(pipe, method_name, _timed(method, stage))
+    return pipe
+
+
+def _timed(method, stage):
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            observe_stage(stage, time.perf_counter() - start_time)
+    return wrapper
+
+
+# Ejecuta el modelo exportado a ONNX con onnxruntime; el tokenizer sigue siendo el de transformers
+class OnnxSentimentPipeline:
+    def __init__(self, model_id, onnx_dir, intra_op_threads=0, inter_op_threads=1):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.id2label = AutoConfig.from_pretrained(model_id).id2label
+        model_path = os.path.join(onnx_dir, model_id.replace("/", "__") + ".onnx")
+        if not os.path.exists(model_path):
+            export_onnx(model_id, model_path, self.tokenizer)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        # 0 deja que onnxruntime use un hilo por núcleo físico
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def __call__(self, inputs, batch_size=None, top_k=1, truncation=True, max_length=None, **kwargs):
+        # Como en el pipeline de transformers: top_k=None devuelve todas las etiquetas ordenadas por score
+        import numpy as np
+
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+        results = []
+        for start in range(0, len(texts), batch_size):
+            start_time = time.perf_counter()
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=truncation, max_length=max_length, return_tensors="np")
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            tokenized_at = time.perf_counter()
+            observe_stage("tokenize", tokenized_at - start_time)
+            logits = self.session.run(None, feed)[0]
+            observe_stage("forward", time.perf_counter() - tokenized_at)
+            logits = logits - logits.max(axis=-1, keepdims=True)
+            probabilities = np.exp(logits) / np.exp(logits).sum(axis=-1, keepdims=True)
+            for row in probabilities:
+                if top_k is None:
+                    order = row.argsort()[::-1]
+                    results.append([{"label": self.id2label[int(index)], "score": float(row[index])} for index in order])
+                else:
+                    best = int(row.argmax())
+                    results.append({"label": self.id2label[best], "score": float(row[best])})
+        return results
+
+
+def export_onnx(model_id, model_path, tokenizer):
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    encoded = tokenizer(["hola"], return_tensors="pt")
+    input_names = list(encoded.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(encoded[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    logger.info("Modelo exportado a ONNX.", extra={"model_id": model_id, "model_path": model_path})
+
+
+def check_parity(model_id, backend, texts, onnx_dir="models/onnx", intra_op_threads=0, inter_op_threads=1):
+    # Compara las etiquetas y puntuaciones del backend con las del pipeline fp32 de referencia
+    reference = load_sentiment_pipeline(model_id, "pytorch")
+    candidate = load_sentiment_pipeline(model_id, backend, onnx_dir, intra_op_threads, inter_op_threads)
+
+    start_time = time.perf_counter()
+    expected = reference(texts, batch_size=len(texts))
+    reference_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    predicted = candidate(texts, batch_size=len(texts))
+    candidate_time = time.perf_counter() - start_time
+
+    matches = sum(1 for a, b in zip(expected, predicted) if a["label"] == b["label"])
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "label_agreement": matches / len(texts),
+        "max_score_diff": max(abs(a["score"] - b["score"]) for a, b in zip(expected, predicted)),
+        "mismatches": [text for text, a, b in zip(texts, expected, predicted) if a["label"] != b["label"]],
+        "reference_time": reference_time,
+        "backend_time": candidate_time,
+    }
+
+
+def main():
+    from src.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Comprueba que un backend de sentimiento da las mismas etiquetas que PyTorch fp32.")
+    parser.add_argument("--backend", choices=BACKENDS, default=settings.sentiment_backend)
+    parser.add_argument("--texts", help="Archivo con un texto por línea; por defecto se usan frases de ejemplo")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    texts = PARITY_TEXTS
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as texts_file:
+            texts = [line.strip() for line in texts_file if line.strip()]
+
+    report = check_parity(
+        settings.sentiment_model_id, args.backend, texts,
+        settings.sentiment_onnx_dir, settings.sentiment_intra_op_threads, settings.sentiment_inter_op_threads
+    )
+    print(f"Backend: {report['backend']} ({report['texts']} textos)")
+    print(f"Coincidencia de etiquetas: {report['label_agreement']:.1%}")
+    print(f"Diferencia máxima de puntuación: {report['max_score_diff']:.4f}")
+    print(f"Tiempo fp32: {report['reference_time']:.3f}s, tiempo {report['backend']}: {report['backend_time']:.3f}s")
+    for text in report["mismatches"]:
+        print(f"  Etiqueta distinta: {text}")
+    sys.exit(0 if report["label_agreement"] >= args.min_agreement else 1)
+
+
+if __name__ == "__main__":
+    main()
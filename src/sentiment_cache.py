@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    # "Estoy  triste " y "estoy triste" comparten entrada
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+# Caché LRU de predicciones del modelo de sentimiento. La clave es el hash del texto normalizado
+# junto con el modelo, así que cambiar sentiment_model_id (o el backend) invalida todo sin borrar nada.
+# Con disk_path se añade un segundo nivel en SQLite que comparten todos los workers de la máquina.
+class SentimentCache:
+    def __init__(self, model_key, max_entries=4096, disk_path=None):
+        self.model_key = model_key
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_path = disk_path
+        self._disk = None
+        self._disk_pid = None
+        if disk_path:
+            self._open_disk()
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, label TEXT NOT NULL, score REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            # Las entradas de otros modelos ya no se pueden servir
+            self._disk.execute("DELETE FROM sentiment_cache WHERE model != ?", (model_key,))
+            # El nivel en disco guarda como mucho diez veces las entradas en memoria; se recorta al arrancar
+            self._disk.execute(
+                "DELETE FROM sentiment_cache WHERE key IN "
+                "(SELECT key FROM sentiment_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries * 10,)
+            )
+
+    def _open_disk(self):
+        self._disk = sqlite3.connect(self.disk_path, check_same_thread=False, isolation_level=None)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute("PRAGMA busy_timeout=5000")
+        self._disk_pid = os.getpid()
+
+    def _disk_connection(self):
+        # Una conexión SQLite no se puede compartir entre procesos: tras un fork cada worker abre la suya
+        if self._disk_pid != os.getpid():
+            self._open_disk()
+        return self._disk
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model_key}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        # Devuelve una predicción o None por cada texto
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                result = self._entries.get(key)
+                if result is None:
+                    missing.append(index)
+                else:
+                    self._entries.move_to_end(key)
+                    results[index] = dict(result)
+            self.hits += len(texts) - len(missing)
+
+        if missing and self._disk is not None:
+            found = self._disk_get([keys[index] for index in missing])
+            still_missing = []
+            for index in missing:
+                result = found.get(keys[index])
+                if result is None:
+                    still_missing.append(index)
+                else:
+                    results[index] = result
+            with self._lock:
+                self.disk_hits += len(missing) - len(still_missing)
+                for index in missing:
+                    if results[index] is not None:
+                        self._add(keys[index], results[index])
+            missing = still_missing
+
+        with self._lock:
+            self.misses += len(missing)
+        return results
+
+    def put_many(self, texts, results):
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            for key, result in zip(keys, results):
+                self._add(key, result)
+        if self._disk is not None:
+            now = time.time()
+            with self._lock:
+                self._disk_connection().executemany(
+                    "INSERT OR REPLACE INTO sentiment_cache (key, model, label, score, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(key, self.model_key, result["label"], result["score"], now) for key, result in zip(keys, results)]
+                )
+
+    def _add(self, key, result):
+        self._entries[key] = {"label": result["label"], "score": result["score"]}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, keys):
+        found = {}
+        # SQLite limita el número de parámetros por consulta
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            with self._lock:
+                rows = self._disk_connection().execute(
+                    f"SELECT key, label, score FROM sentiment_cache WHERE model = ? AND key IN ({placeholders})",
+                    [self.model_key, *chunk]
+                ).fetchall()
+            found.update({key: {"label": label, "score": score} for key, label, score in rows})
+        return found
+
+    def get_stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_key,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk": self._disk is not None,
+        }
@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Guarda en memoria el documento de /status ya serializado junto con su ETag.
+# Se reconstruye cada refresh_interval segundos o cuando algo lo invalida.
+class StatusCache:
+    def __init__(self, build, refresh_interval=30.0):
+        self._build = build
+        self.refresh_interval = refresh_interval
+        self._entry = None
+        self._task = None
+
+    def refresh(self):
+        document = self._build()
+        body = json.dumps(document, ensure_ascii=False, sort_keys=True, default=str)
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:16] + '"'
+        # Se reemplaza la tupla completa para que los lectores nunca vean un estado a medias
+        self._entry = (body, etag)
+        return self._entry
+
+    def invalidate(self):
+        self._entry = None
+
+    def get(self):
+        entry = self._entry
+        if entry is None:
+            entry = self.refresh()
+        return entry
+
+    def peek(self):
+        return self._entry
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error("Error al refrescar el estado del servicio: %s", e)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Las ETags débiles (W/"...") también valen para GET condicionales
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
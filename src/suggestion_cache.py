@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from src.coalescing import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+# Caché TTL/LRU de respuestas de GPT. Cada clave guarda un pequeño conjunto de respuestas
+# distintas que se sirven por turnos y se repone en segundo plano.
+class SuggestionCache:
+    def __init__(self, max_entries=64, ttl=3600.0, pool_size=3):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.pool_size = pool_size
+        self._entries = OrderedDict()
+        self._refills = {}
+        self._flights = SingleFlight("suggestion_cache")
+        self.hits = 0
+        self.misses = 0
+        self.refill_errors = 0
+
+    async def get(self, key, produce):
+        completions = self._fresh_completions(key)
+        if completions:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            entry = self._entries[key]
+            completion = completions[entry["next"] % len(completions)][1]
+            entry["next"] += 1
+            if len(completions) < self.pool_size:
+                self._schedule_refill(key, produce)
+            return completion
+
+        # Los fallos simultáneos de la misma clave esperan a una única llamada a OpenAI
+        self.misses += 1
+        return await self._flights.do(key, lambda: self._produce_first(key, produce))
+
+    async def _produce_first(self, key, produce):
+        completion = await produce()
+        self._add(key, completion)
+        self._schedule_refill(key, produce)
+        return completion
+
+    def _fresh_completions(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        expires_before = time.monotonic() - self.ttl
+        entry["completions"] = [item for item in entry["completions"] if item[0] > expires_before]
+        return entry["completions"]
+
+    def _add(self, key, completion):
+        entry = self._entries.setdefault(key, {"completions": [], "next": 0})
+        self._entries.move_to_end(key)
+        if len(entry["completions"]) < self.pool_size:
+            entry["completions"].append((time.monotonic(), completion))
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            refill = self._refills.pop(evicted_key, None)
+            if refill is not None:
+                refill.cancel()
+
+    def _schedule_refill(self, key, produce):
+        if key in self._refills:
+            return
+        self._refills[key] = asyncio.create_task(self._refill(key, produce))
+
+    async def _refill(self, key, produce):
+        try:
+            while key in self._entries and len(self._fresh_completions(key)) < self.pool_size:
+                self._add(key, await produce())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.refill_errors += 1
+            logger.warning("Error al reponer la caché de sugerencias: %s", e, extra={"key": str(key)})
+        finally:
+            if self._refills.get(key) is asyncio.current_task():
+                del self._refills[key]
+
+    async def close(self):
+        refills = list(self._refills.values())
+        for refill in refills:
+            refill.cancel()
+        await asyncio.gather(*refills, return_exceptions=True)
+
+    def get_stats(self):
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": len(self._entries),
+            "refilling": len(self._refills),
+            "refill_errors": self.refill_errors,
+            "coalesced": self._flights.coalesced,
+        }
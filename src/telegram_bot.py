@@ -1,199 +1,159 @@
-import asyncio
+import logging
 import telebot 
 import requests
 from telebot import types
-from datetime import datetime
 from src.config import get_settings
+from src.logs import configure_logging
 from src.db.db_manage import DatabaseManager
+from src.api_client import ApiClient, ApiError
+from src.rate_limit import check_client_secret
+from src.bot_conversation import BotConversation
+from src.bot_messages import (
+    PREFERENCES,
+    NOT_ALLOWED_MESSAGE,
+    SENTIMENT_PROMPT,
+    PERSONALIZED_PROMPT,
+    PREFERENCE_PROMPT,
+    MOOD_PROMPT,
+    WRITING_MESSAGE,
+    STATUS_ERROR,
+    StreamedReply,
+    build_api_error_reply,
+    build_welcome_message,
+    build_help_message,
+    build_status_message,
+    build_rate_limit_message
+)
 
 _SETTINGS = get_settings()
 
+API_ERRORS = (ApiError, requests.exceptions.RequestException)
+
+configure_logging(_SETTINGS.log_level, _SETTINGS.log_format)
+logger = logging.getLogger(__name__)
+
 API_TOKEN =_SETTINGS.telegram_token
 
-db_manager = DatabaseManager(_SETTINGS.db_host, _SETTINGS.db_port, _SETTINGS.db_user, _SETTINGS.db_pass, _SETTINGS.db_name)
-print (API_TOKEN)
+db_manager = DatabaseManager(
+    _SETTINGS.db_host, _SETTINGS.db_port, _SETTINGS.db_user, _SETTINGS.db_pass, _SETTINGS.db_name,
+    pool_size=_SETTINGS.db_pool_size,
+    pool_timeout=_SETTINGS.db_pool_timeout,
+    ping_interval=_SETTINGS.db_ping_interval
+)
 
 bot = telebot.TeleBot(API_TOKEN)
 
 API_URL = get_settings().api_url
 
-def log_user_data(user_id, user_name, command_time, comando):
-    data = (user_id, user_name, command_time, command_time.date(), comando)
-    return db_manager.insert_user_log(data)  # Devuelve log_id
+api_client = ApiClient(
+    API_URL,
+    pool_size=_SETTINGS.bot_api_pool_size,
+    connect_timeout=_SETTINGS.bot_api_connect_timeout,
+    read_timeout=_SETTINGS.bot_api_timeout,
+    retries=_SETTINGS.bot_api_retries
+)
 
-def get_user_ids_from_log():
-    try:
-        user_ids = db_manager.get_user_ids()
-        return user_ids
-    except Exception as e:
-        print(f"Error al obtener los user_ids de la base de datos: {e}")
-        return set()
+conversation = BotConversation(_SETTINGS, db_manager)
 
 @bot.message_handler(commands=['start'])
 def handle_start(message):
-    user_id = message.from_user.id
-    user_name = message.from_user.username
-    command_time = datetime.now()
-    comando = message.text
-
-    log_user_data(user_id, user_name, command_time, comando)
-
-    bot.reply_to(message, f"Hola {user_name}, bienvenido a tu virtual AI assistant que te ayudará a mejorar tu estado de ánimo y a encontrar recomendaciones personalizadas para ti, puedes ver los comandos disponibles con /help.")
-    print(f"El {user_name} con ID {user_id} hizo el comando {comando} a las {command_time.strftime('%H:%M:%S')}")
+    conversation.log(message)
+    bot.reply_to(message, build_welcome_message(message.from_user.username))
+    conversation.log_command(message)
 
 @bot.message_handler(commands=['help'])
 def handle_help(message):
-    user_id = message.from_user.id
-    user_name = message.from_user.username
-    command_time = datetime.now()
-    comando = message.text
-
-    log_user_data(user_id, user_name, command_time, comando)
-
-    help_message = (
-        f"Hola {user_name}, aquí tienes ayuda sobre cómo utilizar el bot:\n\n"
-        "Comandos disponibles:\n"
-        "/start - Inicia la interacción con el bot y te da la bienvenida.\n"
-        "/help - Muestra esta ayuda.\n"
-        "/status - Obtiene el estado actual del servicio.\n"
-        "/sentiment - Inicia el proceso para analizar el sentimiento de un texto.\n"
-        "/amigo - Inicia el proceso para generar un mensaje personalizado basado en tu estado de ánimo.\n"
-        "/sugerencia - Inicia el proceso para obtener una sugerencia basada en tu estado de ánimo.\n\n"
-        "Si necesitas más información o asistencia, no dudes en escribir el comando correspondiente."
-    )
-
-    bot.reply_to(message, help_message)
-    print(f"El {user_name} con ID {user_id} hizo el comando {comando} a las {command_time.strftime('%H:%M:%S')}")
-
+    conversation.log(message)
+    bot.reply_to(message, build_help_message(message.from_user.username))
+    conversation.log_command(message)
 
 @bot.message_handler(commands=['status'])
 def handle_status(message):
-    user_id = message.from_user.id
-    user_name = message.from_user.username
-    command_time = datetime.now()
-    comando = message.text
-
-    allowed_user_ids = get_user_ids_from_log()
-    if user_id not in allowed_user_ids:
-        bot.reply_to(message, "No tienes permiso para usar este comando.")
+    if not conversation.is_known(message.from_user.id):
+        bot.reply_to(message, NOT_ALLOWED_MESSAGE)
         return
 
-    log_user_data(user_id, user_name, command_time, comando)
-
-    status_url = API_URL + "status" 
+    conversation.log(message)
     try:
-        response = requests.get(status_url)
-        if response.status_code == 200:
-            status_data = response.json()
-            reply_message = f"Nombre del servicio: {status_data['service_name']}\n" \
-                            f"Versión: {status_data['version']}\n" \
-                            f"Nivel de log: {status_data['log_level']}\n" \
-                            f"Modelos utilizados:\n" \
-                            f"  - Sentiment Model: {status_data['models_info']['sentiment_model']}\n" \
-                            f"  - NLP Model: {status_data['models_info']['nlp_model']}\n" \
-                            f"  - GPT Model: {status_data['models_info']['gpt_model']}"
-        else:
-            reply_message = "Error al obtener el estado del servicio."
-    except requests.exceptions.RequestException as e:
-        reply_message = f"Error al conectarse con la API: {e}"
+        status_data = api_client.get_json("status")
+        reply_message = build_status_message(status_data, api_client.get_stats())
+    except API_ERRORS as e:
+        reply_message = build_api_error_reply(e, STATUS_ERROR)
 
-    print(f"El {user_name} con ID {user_id} hizo el comando {comando} a las {command_time.strftime('%H:%M:%S')}")
+    conversation.log_command(message)
     bot.reply_to(message, reply_message)
 
 @bot.message_handler(commands=['sentiment'])
 def handle_sentiment(message):
-    user_id = message.from_user.id
-    user_name = message.from_user.username
-    command_time = datetime.now()
-    comando = message.text
-
-    log_id = log_user_data(user_id, user_name, command_time, comando)
-
-    bot.send_message(user_id, "Por favor, envía el texto para el análisis de sentimiento.")
-    bot.register_next_step_handler(message, analyze_sentiment_step, log_id)
-
-
-def analyze_sentiment_step(message, log_id):
-    user_id = message.from_user.id
-    text = message.text
-
-    sentiment_url = API_URL + "sentiment"
-    payload = {"text": text, "log_id": log_id}
-
-    try:
-        response = requests.post(sentiment_url, json=payload)
-        if response.status_code == 200:
-            sentiment_data = response.json()
-            reply_message = construct_sentiment_reply(sentiment_data, text)
-        else:
-            reply_message = "Error al realizar el análisis de sentimiento."
-    except requests.exceptions.RequestException as e:
-        reply_message = f"Error al conectarse con la API: {e}"
-
-    bot.send_message(user_id, reply_message)
-
-def construct_sentiment_reply(sentiment_data, text):
-    label = sentiment_data["prediction"]["label"]
-    score = sentiment_data["prediction"]["score"]
-    return f"Análisis de Sentimiento:\nTexto: {text}\nSentimiento: {label}\nPuntuación: {score}"
+    log_id = conversation.log(message)
+    bot.send_message(message.from_user.id, SENTIMENT_PROMPT)
+    conversation.begin(message.chat.id, "analyze_sentiment", {"log_id": log_id})
 
 @bot.message_handler(commands=['amigo'])
 def handle_amigo(message):
-    user_id = message.from_user.id
-    user_name = message.from_user.username
-    command_time = datetime.now()
-    comando = message.text
+    conversation.log(message)
+    bot.send_message(message.from_user.id, PERSONALIZED_PROMPT)
+    conversation.begin(message.chat.id, "personalized_response")
 
-    log_user_data(user_id, user_name, command_time, comando)
-
-    bot.send_message(user_id, "Por favor, envía un texto para generar un mensaje basado en tu estado de ánimo.")
-    bot.register_next_step_handler(message, generate_personalized_response)
+@bot.message_handler(commands=['sugerencia'])
+def handle_suggestion(message):
+    markup = types.ReplyKeyboardMarkup(one_time_keyboard=True)
+    markup.add(*PREFERENCES)
+    bot.send_message(message.chat.id, PREFERENCE_PROMPT, reply_markup=markup)
+    conversation.begin(message.chat.id, "get_preference")
 
-def generate_personalized_response(message):
-    user_id = message.from_user.id
-    text = message.text
+def send_api_reply(message, call):
+    try:
+        reply_message = call.build_reply(api_client.post_json(call.path, call.payload, headers=call.headers))
+    except API_ERRORS as e:
+        reply_message = build_api_error_reply(e, call.error_message)
 
-    API_URL = _SETTINGS.api_url
-    response_url = API_URL + "personalized_response"
-    payload = {"text": text}
+    bot.send_message(message.from_user.id, reply_message)
 
+def stream_api_reply(message, call):
+    reply = bot.send_message(message.from_user.id, WRITING_MESSAGE)
+    streamed = StreamedReply(_SETTINGS.bot_stream_edit_interval)
     try:
-        response = requests.post(response_url, json=payload)
-        if response.status_code == 200:
-            response_data = response.json()
-            reply_message = response_data["message"]
-        else:
-            reply_message = "Error al generar la respuesta personalizada."
-    except requests.exceptions.RequestException as e:
-        reply_message = f"Error al conectarse con la API: {e}"
-
-    bot.send_message(user_id, reply_message)
+        for event in api_client.stream_events(call.path, call.payload, headers=call.headers):
+            if streamed.feed(event):
+                break
+            text = streamed.pending_edit()
+            if text is not None:
+                edit_reply(reply, streamed, text)
+    except API_ERRORS as e:
+        streamed.text = build_api_error_reply(e, call.error_message)
+
+    edit_reply(reply, streamed, streamed.final_text())
+
+def edit_reply(reply, streamed, text):
+    if text == streamed.shown:
+        return
+    try:
+        bot.edit_message_text(text, chat_id=reply.chat.id, message_id=reply.message_id)
+    except telebot.apihelper.ApiTelegramException as e:
+        logger.warning("Error al editar el mensaje: %s", e)
+        return
+    streamed.shown = text
 
-@bot.message_handler(commands=['sugerencia'])
-def handle_suggestion(message):
-    markup = types.ReplyKeyboardMarkup(one_time_keyboard=True)
-    markup.add('libro', 'video de youtube', 'cancion', 'serie', 'chiste', 'refran')
-    msg = bot.send_message(message.chat.id, "¿Qué te gustaría que te recomendara?", reply_markup=markup)
-    bot.register_next_step_handler(msg, get_preference)
-
-def get_preference(message):
-    preference = message.text  # Aquí guardas la preferencia del usuario
-    markup = types.ReplyKeyboardRemove()  # Preparas para quitar el teclado
-    msg = bot.send_message(message.chat.id, "Por favor, envíame un mensaje sobre cómo te sientes.", reply_markup=markup)
-    bot.register_next_step_handler(msg, lambda msg: suggest_based_on_mood(msg, preference))
-
-def suggest_based_on_mood(message, preference):
-    user_sentiment_message = message.text  # Aquí tienes el mensaje del usuario sobre cómo se siente
-    user_id = message.from_user.id
-
-    # Aquí enviarías tanto el mensaje del usuario como la preferencia al endpoint /sugerencia
-    response = requests.post(f"{API_URL}sugerencia", json={"message": user_sentiment_message, "preference": preference})
-    if response.status_code == 200:
-        recommendation = response.json()["recommendation"]
-        bot.send_message(user_id, f"{recommendation}")
+# Se registra al final: los comandos tienen prioridad y el resto de textos continúa la conversación pendiente
+@bot.message_handler(content_types=['text'])
+def handle_pending_step(message):
+    pending = conversation.claim_step(message)
+    if pending is None:
+        return
+    if pending.limited:
+        bot.send_message(message.chat.id, build_rate_limit_message(pending.retry_after))
+    elif pending.name == "get_preference":
+        bot.send_message(message.chat.id, MOOD_PROMPT, reply_markup=types.ReplyKeyboardRemove())
+        conversation.remember_preference(message)
     else:
-        bot.send_message(user_id, "Hubo un error al procesar tu solicitud.")
+        call = conversation.api_call(message, pending)
+        if call.stream:
+            stream_api_reply(message, call)
+        else:
+            send_api_reply(message, call)
 
 
 if __name__ == "__main__":
-    bot.infinity_polling()
\ No newline at end of file
+    check_client_secret(_SETTINGS)
+    bot.infinity_polling()
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import urlparse
+import aiohttp
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+from src.api_client import AsyncApiClient, ApiError
+from src.config import get_settings
+from src.logs import configure_logging
+from src.db.db_manage import DatabaseManager
+from src.rate_limit import check_client_secret
+from src.bot_conversation import BotConversation
+from src.bot_messages import (
+    PREFERENCES,
+    NOT_ALLOWED_MESSAGE,
+    SENTIMENT_PROMPT,
+    PERSONALIZED_PROMPT,
+    PREFERENCE_PROMPT,
+    MOOD_PROMPT,
+    WRITING_MESSAGE,
+    STATUS_ERROR,
+    StreamedReply,
+    build_api_error_reply,
+    build_welcome_message,
+    build_help_message,
+    build_status_message,
+    build_rate_limit_message
+)
+
+_SETTINGS = get_settings()
+
+configure_logging(_SETTINGS.log_level, _SETTINGS.log_format)
+logger = logging.getLogger(__name__)
+
+API_ERRORS = (ApiError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+# Procesa los mensajes de cada chat en orden de llegada, uno detrás de otro, mientras que
+# chats distintos avanzan en paralelo hasta max_concurrency handlers a la vez
+class ChatDispatcher:
+    def __init__(self, handle, max_concurrency):
+        self._handle = handle
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues = {}
+        self._tasks = set()
+
+    def submit(self, chat_id, message):
+        queue = self._queues.get(chat_id)
+        if queue is not None:
+            queue.append(message)
+            return
+        self._queues[chat_id] = deque([message])
+        task = asyncio.create_task(self._drain(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, chat_id):
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                message = queue.popleft()
+                async with self._semaphore:
+                    try:
+                        await self._handle(message)
+                    except Exception:
+                        logger.exception("Error al procesar un mensaje.", extra={"chat_id": chat_id})
+        finally:
+            del self._queues[chat_id]
+
+
+class OrderedAsyncTeleBot(AsyncTeleBot):
+    def __init__(self, token, max_concurrency, **kwargs):
+        super().__init__(token, **kwargs)
+        self._dispatcher = ChatDispatcher(self._process_message, max_concurrency)
+
+    async def process_new_messages(self, new_messages):
+        for message in new_messages:
+            self._dispatcher.submit(message.chat.id, message)
+
+    async def _process_message(self, message):
+        await super().process_new_messages([message])
+
+
+db_manager = DatabaseManager(
+    _SETTINGS.db_host, _SETTINGS.db_port, _SETTINGS.db_user, _SETTINGS.db_pass, _SETTINGS.db_name,
+    pool_size=_SETTINGS.db_pool_size,
+    pool_timeout=_SETTINGS.db_pool_timeout,
+    ping_interval=_SETTINGS.db_ping_interval,
+    connect=False
+)
+
+api_client = AsyncApiClient(
+    _SETTINGS.api_url,
+    pool_size=_SETTINGS.bot_api_pool_size,
+    timeout=_SETTINGS.bot_api_timeout,
+    connect_timeout=_SETTINGS.bot_api_connect_timeout
+)
+
+bot = OrderedAsyncTeleBot(_SETTINGS.telegram_token, max_concurrency=_SETTINGS.bot_max_concurrency)
+
+conversation = BotConversation(_SETTINGS, db_manager)
+
+
+@bot.message_handler(commands=['start'])
+async def handle_start(message):
+    await asyncio.to_thread(conversation.log, message)
+    await bot.reply_to(message, build_welcome_message(message.from_user.username))
+    conversation.log_command(message)
+
+@bot.message_handler(commands=['help'])
+async def handle_help(message):
+    await asyncio.to_thread(conversation.log, message)
+    await bot.reply_to(message, build_help_message(message.from_user.username))
+    conversation.log_command(message)
+
+@bot.message_handler(commands=['status'])
+async def handle_status(message):
+    if not await asyncio.to_thread(conversation.is_known, message.from_user.id):
+        await bot.reply_to(message, NOT_ALLOWED_MESSAGE)
+        return
+
+    await asyncio.to_thread(conversation.log, message)
+    try:
+        status_data = await api_client.get_json("status")
+        reply_message = build_status_message(status_data, api_client.get_stats())
+    except API_ERRORS as e:
+        reply_message = build_api_error_reply(e, STATUS_ERROR)
+
+    conversation.log_command(message)
+    await bot.reply_to(message, reply_message)
+
+@bot.message_handler(commands=['sentiment'])
+async def handle_sentiment(message):
+    log_id = await asyncio.to_thread(conversation.log, message)
+    await bot.send_message(message.from_user.id, SENTIMENT_PROMPT)
+    await asyncio.to_thread(conversation.begin, message.chat.id, "analyze_sentiment", {"log_id": log_id})
+
+@bot.message_handler(commands=['amigo'])
+async def handle_amigo(message):
+    await asyncio.to_thread(conversation.log, message)
+    await bot.send_message(message.from_user.id, PERSONALIZED_PROMPT)
+    await asyncio.to_thread(conversation.begin, message.chat.id, "personalized_response")
+
+@bot.message_handler(commands=['sugerencia'])
+async def handle_suggestion(message):
+    markup = types.ReplyKeyboardMarkup(one_time_keyboard=True)
+    markup.add(*PREFERENCES)
+    await bot.send_message(message.chat.id, PREFERENCE_PROMPT, reply_markup=markup)
+    await asyncio.to_thread(conversation.begin, message.chat.id, "get_preference")
+
+async def send_api_reply(message, call):
+    try:
+        reply_message = call.build_reply(await api_client.post_json(call.path, call.payload, headers=call.headers))
+    except API_ERRORS as e:
+        reply_message = build_api_error_reply(e, call.error_message)
+
+    await bot.send_message(message.from_user.id, reply_message)
+
+async def stream_api_reply(message, call):
+    reply = await bot.send_message(message.from_user.id, WRITING_MESSAGE)
+    streamed = StreamedReply(_SETTINGS.bot_stream_edit_interval)
+    try:
+        async for event in api_client.stream_events(call.path, call.payload, headers=call.headers):
+            if streamed.feed(event):
+                break
+            text = streamed.pending_edit()
+            if text is not None:
+                await edit_reply(reply, streamed, text)
+    except API_ERRORS as e:
+        streamed.text = build_api_error_reply(e, call.error_message)
+
+    await edit_reply(reply, streamed, streamed.final_text())
+
+async def edit_reply(reply, streamed, text):
+    if text == streamed.shown:
+        return
+    try:
+        await bot.edit_message_text(text, chat_id=reply.chat.id, message_id=reply.message_id)
+    except ApiTelegramException as e:
+        logger.warning("Error al editar el mensaje: %s", e)
+        return
+    streamed.shown = text
+
+# Se registra al final: los comandos tienen prioridad y el resto de textos continúa la conversación pendiente
+@bot.message_handler(content_types=['text'])
+async def handle_pending_step(message):
+    pending = await asyncio.to_thread(conversation.claim_step, message)
+    if pending is None:
+        return
+    if pending.limited:
+        await bot.send_message(message.chat.id, build_rate_limit_message(pending.retry_after))
+    elif pending.name == "get_preference":
+        await bot.send_message(message.chat.id, MOOD_PROMPT, reply_markup=types.ReplyKeyboardRemove())
+        await asyncio.to_thread(conversation.remember_preference, message)
+    else:
+        call = conversation.api_call(message, pending)
+        if call.stream:
+            await stream_api_reply(message, call)
+        else:
+            await send_api_reply(message, call)
+
+
+def connect_database():
+    try:
+        db_manager.connect()
+    except Exception as e:
+        logger.error("Error al conectar a MySQL: %s", e)
+
+async def main():
+    check_client_secret(_SETTINGS)
+    await asyncio.to_thread(connect_database)
+    await api_client.start()
+    try:
+        if _SETTINGS.bot_webhook_url:
+            # Con webhook Telegram entrega cada update en cuanto llega, sin esperar al siguiente long polling
+            await bot.run_webhooks(
+                listen=_SETTINGS.bot_webhook_listen,
+                port=_SETTINGS.bot_webhook_port,
+                url_path=urlparse(_SETTINGS.bot_webhook_url).path.strip("/") or None,
+                webhook_url=_SETTINGS.bot_webhook_url,
+                secret_token=_SETTINGS.bot_webhook_secret
+            )
+        else:
+            await bot.delete_webhook()
+            await bot.infinity_polling()
+    finally:
+        await api_client.close()
+        await bot.close_session()
+        db_manager.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
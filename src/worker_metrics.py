@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+from src.metrics import REGISTRY, render_families
+
+logger = logging.getLogger(__name__)
+
+
+# Con gunicorn cada worker tiene sus propias métricas y estadísticas, y cada petición a /metrics
+# llega a un worker cualquiera. Cada worker vuelca las suyas en METRICS_DIR/<pid>.json cada
+# interval segundos; quien responde lee las de todos y las combina con una etiqueta pid.
+class WorkerMetrics:
+    def __init__(self, directory=None, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self._stats = {}
+        self._task = None
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def register_stats(self, name, get_stats):
+        # Estadísticas en JSON de un componente por worker (pool, batcher, telemetría)
+        self._stats[name] = get_stats
+
+    def snapshot(self):
+        return {
+            "families": REGISTRY.collect(),
+            "stats": {name: get_stats() for name, get_stats in self._stats.items()},
+        }
+
+    def write(self):
+        # Se escribe en un temporal y se renombra para que nadie lea un archivo a medias
+        path = self._path(os.getpid())
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file, default=str)
+        os.replace(temp_path, path)
+
+    def read_others(self):
+        # El worker que responde usa sus datos actuales; de los demás se lee su último volcado
+        snapshots = {}
+        for file_name in os.listdir(self.directory):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".json" or not name.isdigit() or int(name) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name), encoding="utf-8") as snapshot_file:
+                    snapshots[int(name)] = json.load(snapshot_file)
+            except (OSError, ValueError) as e:
+                logger.warning("No se pudieron leer las métricas de un worker: %s", e, extra={"file": file_name})
+        return snapshots
+
+    def render(self):
+        if not self.enabled:
+            return REGISTRY.render()
+        snapshots = {os.getpid(): {"families": REGISTRY.collect()}, **self.read_others()}
+        families = []
+        for pid, snapshot in sorted(snapshots.items()):
+            for name, kind, documentation, samples in snapshot["families"]:
+                families.append((name, kind, documentation, [(sample_name, {**labels, "pid": pid}, value) for sample_name, labels, value in samples]))
+        return render_families(families)
+
+    def get_stats(self, name):
+        own = self._stats[name]()
+        stats = {"pid": os.getpid(), **own}
+        if self.enabled:
+            workers = {pid: snapshot["stats"].get(name) for pid, snapshot in self.read_others().items()}
+            workers[os.getpid()] = own
+            stats["workers"] = {str(pid): workers[pid] for pid in sorted(workers)}
+        return stats
+
+    def remove(self, pid):
+        # Lo llama el maestro de gunicorn cuando un worker termina (child_exit)
+        if not self.enabled:
+            return
+        try:
+            os.remove(self._path(pid))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.write)
+            except Exception as e:
+                logger.error("Error al volcar las métricas del worker: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.remove(os.getpid())
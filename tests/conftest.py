@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ajustes mínimos para importar la app sin .env: OpenAI simulado y MySQL inalcanzable
+for name, value in {
+    "OPENAI_KEY": "test",
+    "OPENAI_FAKE": "true",
+    "OPENAI_FAKE_LATENCY": "0",
+    "TELEGRAM_TOKEN": "123:test",
+    "API_URL": "http://localhost:8000/",
+    "DB_HOST": "127.0.0.1",
+    "DB_PORT": "1",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "DB_POOL_TIMEOUT": "0.1",
+}.items():
+    os.environ.setdefault(name, value)
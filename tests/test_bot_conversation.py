@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+import pytest
+from src.config import get_settings
+from src.bot_conversation import BotConversation
+from src.rate_limit import MemoryRateLimiter
+
+
+def make_message(text, user_id=7):
+    return SimpleNamespace(text=text, chat=SimpleNamespace(id=user_id), from_user=SimpleNamespace(id=user_id, username="ana"))
+
+
+@pytest.fixture
+def conversation(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "bot_state_backend", "memory")
+    monkeypatch.setattr(settings, "rate_limit_client_secret", "secreto")
+    conversation = BotConversation(settings, db_manager=None)
+    conversation.rate_limiter = MemoryRateLimiter(rate=0.001, burst=1)
+    return conversation
+
+
+def test_limited_step_is_kept_for_a_retry(conversation):
+    conversation.begin(7, "analyze_sentiment", {"log_id": 1})
+    assert not conversation.claim_step(make_message("hola")).limited
+
+    conversation.begin(7, "analyze_sentiment", {"log_id": 2})
+    pending = conversation.claim_step(make_message("hola"))
+    assert pending.limited and pending.retry_after > 0
+    assert conversation.state_store.pop(7) == ("analyze_sentiment", {"log_id": 2})
+
+
+def test_preference_step_is_not_limited(conversation):
+    conversation.rate_limiter.acquire("telegram:7", scope="bot")
+    conversation.begin(7, "get_preference")
+    pending = conversation.claim_step(make_message("libro"))
+    assert pending.name == "get_preference" and not pending.limited
+
+
+def test_suggestion_call_carries_preference_and_client_headers(conversation):
+    conversation.remember_preference(make_message("libro"))
+    message = make_message("estoy bien")
+    call = conversation.api_call(message, conversation.claim_step(message))
+    assert call.path == "sugerencia" and not call.stream
+    assert call.payload == {"message": "estoy bien", "preference": "libro"}
+    assert call.headers == {"X-Client-Id": "telegram:7", "X-Client-Secret": "secreto"}
+    assert call.build_reply({"recommendation": "Lee algo"}) == "Lee algo"
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+import src.app as app_module
+from src.lifecycle import Component
+
+
+def missing_model():
+    raise OSError("No se encontró el modelo de sentimiento")
+
+
+@pytest.fixture
+def client_without_model(monkeypatch):
+    # Sin lifespan: los componentes se cargan con la primera petición que los pide
+    components = dict(app_module.components._components)
+    components["sentiment_model"] = Component("sentiment_model", missing_model, eager=True)
+    components["nlp"] = Component("nlp", lambda: pytest.fail("nlp no debería cargarse"), eager=False)
+    monkeypatch.setattr(app_module.components, "_components", components)
+    return TestClient(app_module.app)
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/analysis", {"text": "hola", "log_id": 1}),
+    ("/analysis/batch", {"items": [{"text": "hola", "log_id": 1}]}),
+    ("/sentiment/batch", {"items": [{"text": "hola", "log_id": 1}]}),
+])
+def test_unavailable_model_returns_503(client_without_model, path, payload):
+    response = client_without_model.post(path, json=payload)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert "sentiment_model" in response.json()["detail"]
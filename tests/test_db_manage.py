@@ -0,0 +1,66 @@
+from datetime import datetime
+import pytest
+from src.db.db_manage import DatabaseManager
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self._results = list(results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return self._results.pop(0)
+
+
+class FakeConnection:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def cursor(self):
+        return FakeCursor(self.results)
+
+    def start_transaction(self):
+        self.calls.append("start_transaction")
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def is_connected(self):
+        return True
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+        self.released = []
+
+    def acquire(self):
+        return self.connection
+
+    def release(self, connection, broken=False):
+        self.released.append(connection)
+
+
+def test_rollup_rolls_back_on_non_mysql_error():
+    # MIN(fecha_hora) devuelve algo que no es un datetime: falla Python, no MySQL, con el FOR UPDATE ya tomado
+    connection = FakeConnection([(datetime(2024, 1, 1),), ("no es una fecha",)])
+    db_manager = DatabaseManager("h", 1, "u", "p", "d", connect=False)
+    db_manager.pool = FakePool(connection)
+
+    with pytest.raises(TypeError):
+        db_manager.rollup_sentiment(datetime(2024, 1, 2))
+
+    assert connection.calls == ["start_transaction", "rollback"]
+    assert db_manager.pool.released == [connection]
@@ -0,0 +1,45 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+import src.app as app_module
+from src.rate_limit import MemoryRateLimiter
+
+
+def make_request(headers):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/sugerencia",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("10.0.0.5", 40000),
+    }
+    return Request(scope)
+
+
+@pytest.fixture
+def limited_app(monkeypatch):
+    monkeypatch.setattr(app_module, "rate_limiter", MemoryRateLimiter(rate=0.001, burst=2))
+    monkeypatch.setattr(app_module._SETTINGS, "rate_limit_client_secret", "secreto")
+    return app_module
+
+
+def bot_headers(user_id, secret="secreto"):
+    return {"X-Client-Id": f"telegram:{user_id}", "X-Client-Secret": secret}
+
+
+def test_bot_users_with_secret_get_separate_buckets(limited_app):
+    for _ in range(2):
+        limited_app.rate_limited(make_request(bot_headers(1)))
+    with pytest.raises(HTTPException) as error:
+        limited_app.rate_limited(make_request(bot_headers(1)))
+    assert error.value.status_code == 429
+
+    # El usuario 2 llega desde la misma IP que el 1, pero tiene su propio bucket
+    limited_app.rate_limited(make_request(bot_headers(2)))
+
+
+def test_client_id_without_secret_falls_back_to_ip(limited_app):
+    for user_id in (1, 2):
+        limited_app.rate_limited(make_request(bot_headers(user_id, secret="otro")))
+    with pytest.raises(HTTPException):
+        limited_app.rate_limited(make_request(bot_headers(3, secret="otro")))
@@ -0,0 +1,37 @@
+import base64
+import json
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from src import reports
+
+
+def encode(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "MQ==",                                         # 1: JSON válido pero no es una lista
+    encode({"hora": "2024-01-01T00:00:00"}),        # objeto en lugar de lista
+    encode(["2024-01-01T00:00:00", "5"]),           # longitud incorrecta
+    encode(["ayer", "5", "modelo"]),                # hora que no es ISO
+    encode([123, "5", "modelo"]),                   # hora que no es texto
+    "%%%",                                          # base64 inválido
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),  # UTF-8 inválido
+])
+def test_malformed_cursor_is_invalid(cursor):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        reports.decode_cursor("labels", cursor)
+
+
+def test_cursor_round_trip():
+    key = [datetime(2024, 1, 1, 5), "5", "modelo"]
+    assert reports.decode_cursor("labels", reports.encode_cursor(key)) == key
+
+
+def test_export_with_malformed_cursor_returns_422():
+    from src.app import app
+
+    client = TestClient(app)
+    response = client.get("/report/export/labels", params={"format": "json", "cursor": "MQ=="})
+    assert response.status_code == 422
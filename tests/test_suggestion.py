@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+from src.app import app
+from src.bot_messages import PREFERENCES
+from src.llm_gateway import SUGGESTION_PROMPTS
+
+
+def test_preferences_match_prompts():
+    assert set(PREFERENCES) == set(SUGGESTION_PROMPTS)
+
+
+def test_unknown_preference_returns_422():
+    client = TestClient(app)
+    response = client.post("/sugerencia", json={"message": "estoy feliz", "preference": "podcast"})
+    assert response.status_code == 422
@@ -0,0 +1,39 @@
+import time
+from src.db.write_behind import WriteBehindWriter
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.rows = []
+
+    def insert_sentiments(self, rows):
+        self.rows.extend(rows)
+
+    insert_analyses = insert_sentiments
+    insert_personalized_responses = insert_sentiments
+
+
+def test_full_queue_drops_without_blocking():
+    # Sin hilo de escritura la cola se llena enseguida; encolar más nunca debe esperar
+    writer = WriteBehindWriter(RecordingDatabase(), max_queue_size=2)
+    start_time = time.perf_counter()
+    for index in range(100):
+        writer.insert_sentiment(index)
+    elapsed = time.perf_counter() - start_time
+
+    stats = writer.get_stats()
+    assert stats["enqueued"] == 2
+    assert stats["dropped"] == 98
+    assert elapsed < 0.05
+
+
+def test_closed_writer_drops_instead_of_writing_inline():
+    database = RecordingDatabase()
+    writer = WriteBehindWriter(database, flush_interval=0.01)
+    writer.start()
+    writer.insert_sentiment(1)
+    writer.close()
+    writer.insert_sentiment(2)
+
+    assert database.rows == [(1,)]
+    assert writer.get_stats()["dropped"] == 1